@@ -1,10 +1,27 @@
 
-from .file_parsing  import parse_file, get_body, get_comments, get_dtype, \
-                            parse_path
+from .file_parsing  import parse_file, parse_header, parse_lines, \
+                            count_lines, count_rows, iter_blocks, \
+                            count_block, find_rows, \
+                            probe, split_file, parse_range, get_body, \
+                            get_comments, get_dtype, parse_path
 from .cl_parsing    import cl_parser
-from .formatting    import get_dstring, tobool
-from .data_io       import read, write, start_file, write_to, add_column, \
+from .formatting    import get_dstring, get_widths, get_precision, \
+                            sub_dtype, tobool
+from .data_io       import read, iter_read, write, write_header, \
+                            start_file, write_to, catalog_writer, \
+                            add_column, add_columns, composite, \
                             read_configs, write_configs
-from .class_io      import save_obj, open_obj
+from .cache         import cache_path, read_cache, write_cache, \
+                            evict_cache, clear_cache
+from .selection     import select, where_columns, where_operators, \
+                            read_columns, apply_where
+from .columnar      import read_columnar, write_columnar
+from .arrow_io      import read_arrow, write_arrow, arrow_formats
+from .stats         import stats_path, block_stats, write_stats, \
+                            read_stats, find_blocks
+from .binning       import bin_pyramid
+from .index         import build_index, get_index, read_rows
+from .class_io      import save_obj, load_obj, open_obj
 from .figure        import smart_figure
-from .display       import progress, timer
+from .display       import progress, progress_bar, timer, profiler, \
+                            profile
@@ -0,0 +1,139 @@
+"""
+This file contains functions which read and write numpy record arrays to and
+from Parquet and Feather files using pyarrow.  The numpy dtype of the array is
+stored in the metadata of the file so that arrays are read back exactly as they
+were written.  Columns may be projected and rows may be filtered while reading,
+in which case Parquet row groups which cannot match are never read.
+
+    io.write( "catalog.parquet", data )
+
+    bright  = io.read(
+        "catalog.parquet", columns=["id", "alpha", "delta"],
+        where=[("mag_r", "<", 24)]
+    )
+"""
+
+from ._imports import *
+
+import  ast
+import  pyarrow.dataset
+import  pyarrow.feather
+import  pyarrow.parquet
+
+##  ========================================================================  ##
+
+arrow_formats   = { ".parquet": "parquet", ".feather": "feather" }
+
+##  ========================================================================  ##
+
+def read_arrow( file_name, columns=None, where=None ):
+    """
+    This function reads a Parquet or Feather file and returns a numpy record
+    array.
+
+    Parameters:
+        file_name       - str
+            name of a .parquet or .feather file
+        columns         - list
+            names of the columns to read; if None, all columns are read
+        where           - str, list
+            filters as (column, operator, value) tuples which must all be true,
+            e.g. [("mag_r", "<", 24), ("delta", ">", 2.1)]; a list of such
+            lists is true when any of its lists is true.  An expression ( see
+            selection.py ) is applied after the columns it uses are read.
+
+    Returns:
+        array           - numpy record array
+    """
+
+    ext     = io.parse_path( file_name )[2]
+    source  = pyarrow.dataset.dataset( file_name, format=arrow_formats[ext] )
+
+    ##  Expressions cannot be given to pyarrow, so read the columns they use
+    ##  and select the rows afterwards.
+
+    if isinstance( where, str ):
+
+        parsed  = io.read_columns( columns, where, source.schema.names )
+        array   = read_arrow( file_name, columns=parsed )
+
+        return  io.apply_where( array, where, columns=columns )
+
+    if where is not None:
+        where   = pyarrow.parquet.filters_to_expression( where )
+
+    table   = source.to_table( columns=columns, filter=where )
+
+    ##  Use the stored numpy dtype if the file was written by write_arrow().
+
+    metadata    = source.schema.metadata or {}
+
+    if b"numpy_dtype" in metadata:
+        descr   = ast.literal_eval( metadata[b"numpy_dtype"].decode() )
+        dtype   = io.sub_dtype( descr, table.column_names )
+
+    else:
+        dtype   = None
+
+    ##  Copy each column into the array.
+
+    values  = [ column.to_numpy() for column in table.columns ]
+
+    if dtype is None:
+        dtype   = np.dtype([
+            ( name, value.dtype if value.dtype != object
+                    else value.astype( str ).dtype )
+            for name, value in zip( table.column_names, values )
+        ])
+
+    array   = np.zeros( table.num_rows, dtype=dtype )
+
+    for name, value in zip( table.column_names, values ):
+        array[ name ]   = value
+
+    return  array
+
+##  ========================================================================  ##
+
+def write_arrow( file_name, array, compression="zstd", row_group_size=2**20 ):
+    """
+    This function writes a numpy record array to a Parquet or Feather file,
+    chosen by the extension of file_name.
+
+    Parameters:
+        file_name       - str
+            name of a .parquet or .feather file
+        array           - ndarray
+            numpy record array to write
+        compression     - str
+            compression codec ( "zstd", "lz4", "snappy" or None )
+        row_group_size  - int
+            number of rows per Parquet row group; smaller groups let filtered
+            reads skip more of the file
+    """
+
+    ext     = io.parse_path( file_name )[2]
+
+    table   = pyarrow.table(
+        [ pyarrow.array( array[name] ) for name in array.dtype.names ],
+        names   = list( array.dtype.names )
+    )
+    table   = table.replace_schema_metadata(
+        { "numpy_dtype": repr( array.dtype.descr ) }
+    )
+
+    if arrow_formats[ ext ] == "parquet":
+
+        pyarrow.parquet.write_table(
+            table, file_name, compression=compression,
+            row_group_size=row_group_size
+        )
+
+    else:
+
+        if compression in [ None, "zstd", "lz4" ]:
+            pyarrow.feather.write_feather(
+                table, file_name, compression=compression or "uncompressed"
+            )
+        else:
+            raise ValueError( "Feather files support 'zstd' or 'lz4' only." )
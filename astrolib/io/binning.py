@@ -0,0 +1,150 @@
+"""
+This file contains the class bin_pyramid, which bins one or two columns of a
+catalog once at a fine resolution and then sums the bins in pairs to make each
+coarser level.  Any range of the columns may then be shown at about a given
+number of bins by slicing the level which suits the range, so that the cost of
+drawing a view depends on the number of bins and not on the number of rows.
+
+    pyramid = io.bin_pyramid( data["mag_g"], data["mag_r"] )
+    counts, x_edges, y_edges = pyramid.view( (20, 24), (20, 24), bins=256 )
+"""
+
+from ._imports import *
+
+##  ========================================================================  ##
+
+class bin_pyramid:
+    """
+    A multi-resolution histogram of one or two columns.  The finest level has
+    2**levels bins along each axis over the finite range of the columns, and
+    each level after it has half as many.
+    """
+
+    def __init__( self, x, y=None, levels=None, range=None ):
+
+        ##  Use the finite rows only.
+
+        columns     = [ np.asarray(x) ]
+
+        if y is not None:
+            columns.append( np.asarray(y) )
+
+        finite      = np.ones( columns[0].shape, dtype=bool )
+
+        for column in columns:
+            finite &= np.isfinite( column )
+
+        columns     = [ column[finite] for column in columns ]
+
+        if levels is None:
+            levels  = 16 if len( columns ) == 1 else 11
+
+        self.dims   = len( columns )
+        self.levels = levels
+        self.size   = 2**levels
+        self.rows   = columns[0].size
+
+        ##  Find the range of each axis.
+
+        if range is None:
+            range   = [
+                ( column.min(), column.max() ) if column.size > 0 else (0, 1)
+                for column in columns
+            ]
+
+        self.range  = [
+            ( float(low), float(high) if high > low else float(low) + 1 )
+            for low, high in range
+        ]
+
+        ##  Bin the rows at the finest level with a single bincount.
+
+        flat    = np.zeros( self.rows, dtype="int64" )
+
+        for column, ( low, high ) in zip( columns, self.range ):
+
+            index   = ( (column - low) * (self.size / (high - low)) )
+            index   = np.clip( index.astype("int64"), 0, self.size - 1 )
+            flat    = flat * self.size + index
+
+        counts  = np.bincount( flat, minlength=self.size**self.dims )
+        counts  = counts.reshape( (self.size,) * self.dims )
+
+        ##  Sum pairs of bins along every axis for each coarser level.
+
+        self.counts = [ counts ]
+
+        for level in np.arange( levels ):
+
+            shape   = []
+
+            for n in counts.shape:
+                shape  += [ n // 2, 2 ]
+
+            counts  = counts.reshape( shape ).sum(
+                axis=tuple( np.arange(1, 2*self.dims, 2) )
+            )
+            self.counts.append( counts )
+
+    def edges( self, axis, level ):
+        """
+        Returns the bin edges of an axis at a level, where level 0 is finest.
+        """
+
+        low, high   = self.range[ axis ]
+
+        return  np.linspace( low, high, self.size // 2**level + 1 )
+
+    def view( self, x_lim=None, y_lim=None, bins=256 ):
+        """
+        Returns the counts within the given limits with at least bins bins
+        across the range of each axis, as few as the levels allow, with the bin
+        edges of each axis.  The limits are rounded out to the bins.
+        """
+
+        limits  = [ x_lim, y_lim ][ :self.dims ]
+        limits  = [
+            self.range[axis] if limit is None else limit
+            for axis, limit in enumerate( limits )
+        ]
+
+        ##  Choose the coarsest level for each axis which still has enough
+        ##  bins across its range.
+
+        levels  = []
+
+        for axis, ( low, high ) in enumerate( limits ):
+
+            full    = self.range[axis][1] - self.range[axis][0]
+            wanted  = max( (high - low) / bins, 1e-300 )
+            levels.append( int( np.clip(
+                np.floor( np.log2(wanted * self.size / full) ), 0, self.levels
+            )))
+
+        ##  Slice the bins which cover the limits from the finest of these
+        ##  levels, and sum the bins of any axis which should be coarser.
+
+        counts  = self.counts[ min(levels) ]
+        edges   = []
+
+        for axis, ( low, high ) in enumerate( limits ):
+
+            base, top   = self.range[ axis ]
+            n           = self.size // 2**levels[axis]
+            width       = ( top - base ) / n
+            factor      = 2**( levels[axis] - min(levels) )
+
+            start   = int( np.clip( np.floor((low - base) / width), 0, n ) )
+            stop    = int( np.clip( np.ceil((high - base) / width), start, n ) )
+
+            index           = [ slice(None) ] * self.dims
+            index[ axis ]   = slice( start * factor, stop * factor )
+            counts          = counts[ tuple(index) ]
+
+            shape           = list( counts.shape )
+            shape[ axis:axis+1 ]    = [ stop - start, factor ]
+            counts          = counts.reshape( shape ).sum( axis=axis+1 )
+
+            edges.append( self.edges( axis, levels[axis] )[ start:stop+1 ] )
+
+        return  ( counts, ) + tuple( edges )
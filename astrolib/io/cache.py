@@ -0,0 +1,142 @@
+"""
+This file contains the binary cache used by io.read().  Once an ascii catalog
+has been parsed, the record array is stored as a .npy file in a cache directory
+so that later reads of the unchanged file simply memory map the cached array.
+
+Each cached array is keyed by the path, size and modification time of the ascii
+file as well as the '#<' header of the file and the requested dtype, columns
+and where condition.  Changing the file in any way therefore makes its old
+entries unreachable.  The least recently used entries are removed once the
+cache grows larger than cache_size.
+"""
+
+from ._imports import *
+
+import  hashlib
+
+##  ========================================================================  ##
+
+cache_dir   = os.path.join( os.path.expanduser("~"), ".cache", "astrolib" )
+cache_size  = 8 * 2**30                                 ##  bytes
+
+##  ========================================================================  ##
+
+def cache_path(
+    file_name, dtype=None, columns=None, where=None, kind="array"
+):
+    """
+    Returns the path of the cached array for an ascii file.  The name of the
+    cached file starts with a hash of the ascii file path so that all entries of
+    a file may be found by clear_cache().  The kind of entry, such as "array"
+    or "index", is part of the key.
+    """
+
+    file_name   = os.path.abspath( file_name )
+    stat        = os.stat( file_name )
+    header      = io.parse_header( file_name )[1]
+
+    path_hash   = hashlib.sha1( file_name.encode() ).hexdigest()[:16]
+    key_hash    = hashlib.sha1(
+        repr((
+            kind, stat.st_size, stat.st_mtime_ns, header, dtype, columns,
+            where
+        )).encode()
+    ).hexdigest()[:16]
+
+    return  os.path.join( cache_dir, path_hash + "_" + key_hash + ".npy" )
+
+##  ========================================================================  ##
+
+def read_cache( file_name, dtype=None, columns=None, where=None ):
+    """
+    Returns the cached array of an ascii file as a copy-on-write memory map, or
+    None if the file has not been cached since it last changed.
+    """
+
+    path    = cache_path(
+        file_name, dtype=dtype, columns=columns, where=where
+    )
+
+    if not os.path.isfile( path ):
+        return None
+
+    ##  Mark the entry as recently used.
+
+    os.utime( path )
+
+    return  np.load( path, mmap_mode="c" )
+
+def write_cache( file_name, array, dtype=None, columns=None, where=None ):
+    """
+    Stores the parsed array of an ascii file in the cache and then removes the
+    least recently used entries if the cache has grown too large.
+    """
+
+    path    = cache_path(
+        file_name, dtype=dtype, columns=columns, where=where
+    )
+
+    os.makedirs( cache_dir, exist_ok=True )
+
+    ##  Write to a temporary file first so that an interrupted write never
+    ##  leaves a partial entry behind.
+
+    temp    = path + ".%i.tmp" % os.getpid()
+
+    with open( temp, "wb" ) as out_file:
+        np.save( out_file, array )
+
+    os.replace( temp, path )
+
+    evict_cache( cache_size )
+
+##  ========================================================================  ##
+
+def evict_cache( size ):
+    """
+    Removes the least recently used entries until the cache holds no more than
+    size bytes.
+    """
+
+    if not os.path.isdir( cache_dir ):
+        return
+
+    entries = []
+
+    for name in os.listdir( cache_dir ):
+
+        if name.endswith( ".npy" ):
+            stat    = os.stat( os.path.join(cache_dir, name) )
+            entries.append( (stat.st_mtime, stat.st_size, name) )
+
+    entries.sort()
+    total   = sum( entry[1] for entry in entries )
+
+    for mtime, entry_size, name in entries:
+
+        if total <= size:
+            break
+
+        os.remove( os.path.join(cache_dir, name) )
+        total  -= entry_size
+
+def clear_cache( file_name=None ):
+    """
+    Removes the cached arrays of an ascii file, or the entire cache if no file
+    name is given.
+    """
+
+    if not os.path.isdir( cache_dir ):
+        return
+
+    prefix  = ""
+
+    if file_name is not None:
+        prefix  = hashlib.sha1(
+            os.path.abspath( file_name ).encode()
+        ).hexdigest()[:16]
+
+    for name in os.listdir( cache_dir ):
+
+        if name.startswith( prefix ) and name.endswith( ".npy" ):
+            os.remove( os.path.join(cache_dir, name) )
@@ -20,18 +20,19 @@ class catter:
 
         self.data           = io.read( file_name, dtype=dtype )
         self.dtype          = self.data.dtype
+        self.size           = len( self.data )
+        self.columns        = {}                    ## columns made by new_space
 
-        ## History.
+        ## History.  Each cut pushes its mask, packed to one bit per row, onto
+        ## the history along with the statistics computed under it, so undo()
+        ## and restore() only drop entries.
 
-        self.original       = np.arange( len(self.data) )
-        self.indices        = np.copy( self.original )
-        self.removed        = float( len(self.indices) ) / len(self.data)
         self.history        = []
+        self.push( np.ones(self.size, dtype=bool) )
 
         ## Distribution.
 
         self.parameter      = None
-        self.distribution   = None
 
         ## Statistics.
 
@@ -43,23 +44,204 @@ class catter:
 
         ## Matplotlib.
 
+        self.figure         = None
+
         if ion is True:
             pyplot.ion()
 
+    ######################################################   S E L E C T I O N S
+
+    def push( self, mask=None, cut=None, ordered=None ):
+        """
+        Push a mask onto the history.  Only the newest mask is kept unpacked,
+        and only the newest entry keeps its sorted columns and pyramids, so the
+        memory used does not grow with the history.  A range cut of the
+        selected column may be pushed as cut, a tuple of ( parameter, minimum,
+        maximum ), with the sorted values which remain, in which case its mask
+        is only made once it is needed.
+        """
+
+        if len( self.history ) > 0:
+            self.history[-1]["mask"]        = None
+            self.history[-1]["indices"]     = None
+            self.history[-1]["sorted"]      = {}
+            self.history[-1]["pyramids"]    = {}
+
+        entry   = {
+            "bits":     None,
+            "mask":     mask,
+            "cut":      cut,
+            "count":    None,
+            "indices":  None,
+            "sorted":   {},
+            "stats":    {},
+            "pyramids": {},
+        }
+
+        if mask is not None:
+            entry["bits"]   = np.packbits( mask )
+            entry["count"]  = np.count_nonzero( mask )
+
+        else:
+            entry["sorted"][ cut[0] ]   = ordered
+            entry["count"]              = ordered.size
+
+        self.history.append( entry )
+
+    def entry_mask( self, k ):
+        """
+        Returns the mask of entry k of the history.
+        """
+
+        entry   = self.history[k]
+
+        if entry["mask"] is not None:
+            return  entry["mask"]
+
+        if entry["bits"] is not None:
+            return  np.unpackbits( entry["bits"], count=self.size ).view( bool )
+
+        ##  Make the mask of a range cut from the mask before it.
+
+        parameter, minimum, maximum = entry["cut"]
+        column                      = self.column( parameter )
+
+        mask    = self.entry_mask( k-1 ) & ( column >= minimum )
+        mask   &= column <= maximum
+
+        entry["bits"]   = np.packbits( mask )
+
+        return  mask
+
+    @property
+    def mask( self ):
+        """
+        The boolean mask of the rows which remain.
+        """
+
+        entry   = self.history[-1]
+
+        if entry["mask"] is None:
+            entry["mask"]   = self.entry_mask( len(self.history) - 1 )
+
+        return  entry["mask"]
+
+    @property
+    def indices( self ):
+        """
+        The indices of the rows which remain.
+        """
+
+        entry   = self.history[-1]
+
+        if entry["indices"] is None:
+            entry["indices"]    = np.flatnonzero( self.mask )
+
+        return  entry["indices"]
+
+    @property
+    def removed( self ):
+        """
+        The fraction of the rows which have been cut.
+        """
+
+        return  1 - self.history[-1]["count"] / max( self.size, 1 )
+
+    def column( self, parameter ):
+        """
+        Returns the full column of a parameter.
+        """
+
+        if parameter in self.columns:
+            return  self.columns[ parameter ]
+
+        return  self.data[ parameter ]
+
+    @property
+    def distribution( self ):
+        """
+        The selected column of the rows which remain.
+        """
+
+        if self.parameter is None:
+            return  None
+
+        return  self.column( self.parameter )[ self.mask ]
+
+    @property
+    def sorted( self ):
+        """
+        The sorted values of the selected column of the rows which remain,
+        without NaNs.  Range cuts of the selected column slice this array, so
+        it is only sorted again after other cuts.
+        """
+
+        ordered = self.history[-1]["sorted"]
+
+        if self.parameter not in ordered:
+
+            values  = np.sort( self.distribution )
+
+            if values.dtype.kind == "f":
+                values  = values[ :values.size - np.isnan( values ).sum() ]
+
+            ordered[ self.parameter ]   = values
+
+        return  ordered[ self.parameter ]
+
+    def quantile( self, q ):
+        """
+        Returns the q quantiles of the selected column of the rows which
+        remain, interpolated linearly from the sorted values.
+        """
+
+        values      = self.sorted
+
+        if values.size == 0:
+            return  np.full( np.shape(q), np.nan )[()]
+
+        position    = np.asarray( q, dtype="float64" ) * ( values.size - 1 )
+        low         = np.floor( position ).astype( "int64" )
+        high        = np.minimum( low + 1, values.size - 1 )
+
+        return  values[low] + (values[high] - values[low]) * (position - low)
+
     ##########################################   B A S I C   O P E R A T I O N S
 
     def update( self, bins=50 ):
         """
-        Update the stats and plot.
+        Update the stats and plot.  The stats of each column are computed once
+        for each mask from its sorted values.
         """
 
         if self.parameter != None:
 
-            self.mean       = np.mean( self.distribution )
-            self.median     = np.median( self.distribution )
-            self.mode       = 3 * self.median - 2 * self.mean
-            self.std        = np.std( self.distribution )
-            self.rms        = self.std**2
+            stats   = self.history[-1]["stats"]
+
+            if self.parameter not in stats:
+
+                values          = self.sorted
+                mean            = np.nan
+                median          = np.nan
+                std             = np.nan
+
+                ##  No rows remain with a value, so the stats are NaN.
+
+                if values.size > 0:
+                    mean        = np.mean( values )
+                    median      = self.quantile( 0.5 )
+                    std         = np.std( values )
+
+                stats[ self.parameter ] = {
+                    "mean":     mean,
+                    "median":   median,
+                    "mode":     3 * median - 2 * mean,
+                    "std":      std,
+                    "rms":      std**2,
+                }
+
+            for key, value in stats[ self.parameter ].items():
+                setattr( self, key, value )
 
             self.hist( bins=bins )
 
@@ -68,11 +250,7 @@ class catter:
         Undo all changes made to the array.
         """
 
-        self.indices    = np.copy( self.original )
-
-        if self.parameter != None:
-
-            self.distribution = self.data[self.original][self.parameter]
+        del self.history[1:]
 
         self.update()
 
@@ -81,12 +259,11 @@ class catter:
         Return data to status before previous operation.
         """
 
-        if len( self.history ) > 0:
+        if len( self.history ) > 1:
+
+            del self.history[-1]
 
-            self.indices        = self.history[-2]
-            self.distribution   = self.data[self.indices][self.parameter]
             self.update()
-            del self.history[-1:]
 
     def write( self, file_name, clobber=True ):
         """
@@ -95,11 +272,11 @@ class catter:
         is not overwritten.
         """
 
-        io.write( file_name, self.data[self.indices] )
+        io.write( file_name, self.data[self.mask] )
 
         if clobber == False:
 
-            io.write( 'cut_' + file_name, np.delete(self.data,self.indices) )
+            io.write( 'cut_' + file_name, self.data[~self.mask] )
 
     def display( self ):
         """
@@ -125,16 +302,18 @@ class catter:
         """
 
         self.parameter      = parameter
-        self.distribution   = self.data[self.indices][self.parameter]
         self.update()
 
     def new_space( self, new_array, parameter ):
         """
-        Create a new space.
+        Create a new space from an array of the rows which remain.
         """
 
-        self.parameter      = parameter
-        self.distribution   = new_array
+        column              = np.zeros( self.size, dtype=new_array.dtype )
+        column[ self.mask ] = new_array
+
+        self.columns[ parameter ]   = column
+        self.parameter              = parameter
         self.update()
 
     def cut_min( self, value ):
@@ -142,41 +321,78 @@ class catter:
         Cut all elements below specified value from the distribution.
         """
 
-        cuts                    = np.where( self.distribution >= value )[0]
-        self.distribution       = self.distribution[ cuts ]
-        self.indices            = self.indices[ cuts ]
-        self.history.append( self.indices )
-        self.update()
+        self.cut( value, np.inf )
 
     def cut_max( self, value ):
         """
         Cut all elements above specified value from the distribution.
         """
 
-        cuts                    = np.where( self.distribution <= value )[0]
-        self.distribution       = self.distribution[ cuts ]
-        self.indices            = self.indices[ cuts ]
-        self.history.append( self.indices )
+        self.cut( -np.inf, value )
+
+    def cut_where( self, where ):
+        """
+        Cut all elements which do not satisfy a where condition on the columns
+        of the catalog, e.g. "(mag_r < 24) & (delta > 2.1)".
+        """
+
+        self.push( self.mask & io.select( self.data, where ) )
         self.update()
 
     def cut( self, minimum, maximum ):
         """
-        Cut all elements outside of specified range.
+        Cut all elements outside of specified range.  The values which remain
+        are found by searching the sorted values of the selected column.
         """
 
-        if minimum < maximum:
-            self.cut_min( minimum )
-            self.cut_max( maximum )
+        minimum, maximum    = min( minimum, maximum ), max( minimum, maximum )
+
+        if minimum == maximum:
+            return
+
+        values  = self.sorted
+        start   = np.searchsorted( values, minimum, side="left" )
+        stop    = np.searchsorted( values, maximum, side="right" )
 
-        elif minimum > maximum:
-            self.cut_min( maximum )
-            self.cut_max( minimum )
+        ##  Copy the values which remain, so that the sorted values of the entry
+        ##  below may be freed.
+
+        self.push(
+            cut=( self.parameter, minimum, maximum ),
+            ordered=values[ start:stop ].copy()
+        )
+        self.update()
 
     ##########################################################   P L O T T I N G
 
+    def binned( self, bins=50 ):
+        """
+        Returns the bin edges and counts of the selected column of the rows
+        which remain.  The counts are found by searching the sorted values.
+        """
+
+        values  = self.sorted
+
+        if values.size == 0:
+            return  np.linspace( 0, 1, bins+1 ), np.zeros( bins, dtype="int64" )
+
+        low, high   = values[0], values[-1]
+
+        if low == high:
+            low, high   = low - 0.5, high + 0.5
+
+        edges   = np.linspace( low, high, bins+1 )
+        counts  = np.diff( np.searchsorted(values, edges, side="right") )
+
+        counts[0]  += np.searchsorted( values, edges[0], side="right" )
+
+        return  edges, counts
+
     def hist( self, bins=50 ):
         """
-        Plot a histogram of the distribution.
+        Plot a histogram of the distribution.  The figure is made once and its
+        histogram is updated in place after each change, being blitted when the
+        axes limits have not changed.
         """
 
         ## Ensure a parameter is selected.
@@ -185,26 +401,146 @@ class catter:
 
             raise NameError("A parameter must be selected to plot.")
 
-        ## Plot a histogram of the selected distribution.
+        ## Find the density of each bin.
 
-        pyplot.close()
-        h_fig       = pyplot.figure()
-        h_axes      = h_fig.add_subplot( 1,1,1 )
+        edges, counts   = self.binned( bins )
+        density         = counts / max( counts.sum(), 1 ) / np.diff( edges )
+        label           = '%i  Objects' % counts.sum()
+        limits          = (
+            edges[0], edges[-1], 0,
+            1.2 * density.max() if density.max() > 0 else 1
+        )
 
-        ## Statistics.
+        ## Make the figure if it is not open.
 
-        #mode_x    = ( self.mode, self.mode )
-        #mode_y    = ( self.mode-self.std, self.mode+self.std )
-        #h_axes.plot( mode_x, mode_y, 'g--' )
+        if self.figure is None or not pyplot.fignum_exists(self.figure.number):
 
-        ## Histogram
+            self.figure = pyplot.figure()
+            self.axes   = self.figure.add_subplot( 1,1,1 )
+            self.stairs = self.axes.stairs(
+                density, edges, color='k', animated=True
+            )
+            self.label  = self.axes.text(
+                0.97, 0.95, label, transform=self.axes.transAxes,
+                ha='right', va='top', animated=True
+            )
+            self.limits = None
 
-        h_axes.set_xlabel( self.parameter )
+            self.figure.canvas.mpl_connect( "draw_event", self.on_draw )
 
-        h_axes.hist(
-            self.distribution, bins,
-            normed=True, histtype='step', color='k',
-            label='%i  Objects' % len(self.distribution)
-        )
+        else:
+
+            self.stairs.set_data( density, edges )
+            self.label.set_text( label )
+
+        ## Redraw everything if the axes have changed.  Otherwise, only draw
+        ## the histogram over the saved background.
+
+        canvas  = self.figure.canvas
+
+        if limits != self.limits or self.axes.get_xlabel() != self.parameter:
+
+            self.axes.set_xlabel( self.parameter )
+            self.axes.set_xlim( limits[0], limits[1] )
+            self.axes.set_ylim( limits[2], limits[3] )
+
+            canvas.draw()
+
+            self.limits     = limits
+
+        else:
+
+            canvas.restore_region( self.background )
+
+            self.axes.draw_artist( self.stairs )
+            self.axes.draw_artist( self.label )
+            canvas.blit( self.axes.bbox )
+
+        canvas.flush_events()
+
+    def on_draw( self, event ):
+        """
+        Save the background of the axes and draw the histogram over it after
+        every full draw of the figure, such as after a resize, a zoom or a
+        call to hist() which changes the axes.  The histogram is animated, so
+        it is not drawn by the figure itself.
+        """
+
+        canvas          = self.figure.canvas
+        self.background = canvas.copy_from_bbox( self.axes.bbox )
+
+        self.axes.draw_artist( self.stairs )
+        self.axes.draw_artist( self.label )
+
+    def view( self, x, y=None, bins=256, levels=None ):
+        """
+        Plot a density binned view of one column, or of two columns against
+        each other, of the rows which remain.  The columns are binned once for
+        each mask into a pyramid of resolutions ( see binning.py ), and zooming
+        or panning re-bins only the visible range from the pyramid, so drawing
+        does not depend on the number of rows.
+        """
+
+        pyramids    = self.history[-1]["pyramids"]
+        key         = ( x, y, levels )
+
+        if key not in pyramids:
+            pyramids[ key ] = io.bin_pyramid(
+                self.column( x )[ self.mask ],
+                None if y is None else self.column( y )[ self.mask ],
+                levels=levels
+            )
+
+        pyramid     = pyramids[ key ]
+
+        ## Plot the full range.
+
+        v_fig       = pyplot.figure()
+        v_axes      = v_fig.add_subplot( 1,1,1 )
+        view        = pyramid.view( bins=bins )
+
+        v_axes.set_xlabel( x )
+
+        if y is None:
+
+            artist  = v_axes.stairs( view[0], view[1], color='k' )
+            v_axes.set_ylim( 0, 1.2 * max( view[0].max(), 1 ) )
+
+        else:
+
+            artist  = v_axes.imshow(
+                view[0].T, origin='lower', aspect='auto', cmap='gray_r',
+                interpolation='nearest', norm=colors.LogNorm(),
+                extent=( view[1][0], view[1][-1], view[2][0], view[2][-1] )
+            )
+            v_axes.set_ylabel( y )
+            v_axes.set_ylim( view[2][0], view[2][-1] )
+
+        v_axes.set_xlim( view[1][0], view[1][-1] )
+
+        ## Re-bin the visible range whenever the limits change.
+
+        def rebin( axes ):
+
+            if y is None:
+
+                counts, edges   = pyramid.view( axes.get_xlim(), bins=bins )
+                artist.set_data( counts, edges )
+
+            else:
+
+                counts, x_edges, y_edges    = pyramid.view(
+                    axes.get_xlim(), axes.get_ylim(), bins=bins
+                )
+                artist.set_data( counts.T )
+                artist.autoscale()
+                artist.set_extent(
+                    ( x_edges[0], x_edges[-1], y_edges[0], y_edges[-1] )
+                )
+
+            axes.figure.canvas.draw_idle()
+
+        v_axes.callbacks.connect( "xlim_changed", rebin )
 
-        h_axes.legend( loc='best', frameon=False )
+        if y is not None:
+            v_axes.callbacks.connect( "ylim_changed", rebin )
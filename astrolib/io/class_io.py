@@ -1,20 +1,42 @@
 """
 This file contains functions which help to save and open class objects to and
 from file.
+
+Objects are saved as snapshots.  Each attribute of the object is pickled with
+protocol 5, which keeps the data of numpy arrays out of the pickle so that it
+may be written as raw buffers.  A snapshot looks like:
+
+    magic | table length | table | pickled attributes | array buffers
+
+The table holds the position of each attribute and buffer in the file.  When a
+snapshot is opened, the file is memory mapped and the arrays are made directly
+on the mapped buffers, so only the pages of an array which are used are ever
+read.  Files written by earlier versions with gzip are still opened.
 """
 
 from ._imports import *
 
+import  mmap
+import  zlib
+
+##  ============================================================================
+
+snapshot_magic  = b"ASTROSNAP\x01"
+snapshot_align  = 64
+
 ##  ============================================================================
 
-def save_obj( obj, saveas, overwrite=False ):
+def save_obj( obj, saveas, overwrite=False, compress=None ):
     """
-    Writes the instantiation of an object to a python pickle file.
+    Writes the attributes of an object to a snapshot file.
 
     Arguments:
         obj             - the object to be written to file.
         saveas          - file path to save to; if None, uses existing path
         overwrite=False - if overwrite=True, overwrites existing file paths
+        compress=None   - zlib level used for the arrays of every attribute, or
+                          a dict of levels by attribute name; compressed arrays
+                          are read into memory rather than memory mapped
     """
 
     ##  Don't write over existing file without permission.
@@ -22,15 +44,132 @@ def save_obj( obj, saveas, overwrite=False ):
     if os.path.isfile( saveas ) and overwrite is False:
         raise   Exception( saveas + " already exists.  Set 'overwrite=True'." )
 
-    ##  Write object to file.
+    ##  Pickle each attribute and keep its arrays out-of-band.
+
+    pickles     = []
+    buffers     = []
+
+    for key, value in obj.__dict__.items():
+
+        raw     = []
+        data    = pickle.dumps( value, protocol=5, buffer_callback=raw.append )
+
+        if isinstance( compress, dict ):
+            level   = compress.get( key )
+        else:
+            level   = compress
+
+        for buffer in raw:
+
+            buffer  = buffer.raw()
+
+            if level is not None:
+                buffer  = zlib.compress( buffer, level )
+
+            buffers.append( (key, level, buffer) )
+
+        pickles.append( (key, data) )
+
+    ##  Lay out the attributes and then the buffers, each buffer aligned so
+    ##  that its array may be used in place.  Positions are from the end of
+    ##  the table.
+
+    table       = { "attributes": [], "buffers": [] }
+    position    = 0
+
+    for key, data in pickles:
+        table["attributes"].append( (key, position, len(data)) )
+        position   += len( data )
+
+    for key, level, buffer in buffers:
+        position   += -position % snapshot_align
+        table["buffers"].append( (key, level, position, len(buffer)) )
+        position   += len( buffer )
+
+    table       = pickle.dumps( table, protocol=5 )
+    start       = len( snapshot_magic ) + 8 + len( table )
+    padding     = -start % snapshot_align
+
+    ##  Write to a temporary file first, as the file being replaced may still
+    ##  be memory mapped by an object which was opened from it.
+
+    temp        = saveas + ".%i.tmp" % os.getpid()
+
+    with open( temp, "wb" ) as out_file:
 
-    pickle.dump( obj, gzip.open(saveas, "wb"), protocol=4 )
+        out_file.write( snapshot_magic )
+        out_file.write( (len( table ) + padding).to_bytes(8, "little") )
+        out_file.write( table + padding * b"\0" )
+
+        position    = 0
+
+        for key, data in pickles:
+            out_file.write( data )
+            position   += len( data )
+
+        for key, level, buffer in buffers:
+            out_file.write( (-position % snapshot_align) * b"\0" )
+            position   += -position % snapshot_align
+            out_file.write( buffer )
+            position   += len( buffer )
+
+    os.replace( temp, saveas )
 
 ##  ============================================================================
 
+def load_obj( file_name ):
+    """
+    Returns the attributes saved in a snapshot file as a dictionary.  Arrays
+    which were not compressed are copy-on-write memory maps of the file, so
+    they may be changed without changing the file.
+    """
+
+    with open( file_name, "rb" ) as in_file:
+
+        ##  Open files written with gzip and pickle by earlier versions.
+
+        if in_file.read( len(snapshot_magic) ) != snapshot_magic:
+            return  pickle.load( gzip.open(file_name, "rb") ).__dict__
+
+        length  = int.from_bytes( in_file.read(8), "little" )
+        table   = pickle.loads( in_file.read(length) )
+        start   = len( snapshot_magic ) + 8 + length
+
+        mapped  = memoryview(
+            mmap.mmap( in_file.fileno(), 0, access=mmap.ACCESS_COPY )
+        )
+
+    ##  Gather the buffers of each attribute.
+
+    buffers     = collections.defaultdict( list )
+
+    for key, level, position, size in table["buffers"]:
+
+        buffer  = mapped[ start+position : start+position+size ]
+
+        ##  Decompress into a bytearray so that the array is writable, like
+        ##  the arrays mapped with ACCESS_COPY.
+
+        if level is not None:
+            buffer  = bytearray( zlib.decompress( buffer ) )
+
+        buffers[ key ].append( buffer )
+
+    ##  Unpickle each attribute with its buffers.
+
+    attributes  = {}
+
+    for key, position, size in table["attributes"]:
+        attributes[ key ]   = pickle.loads(
+            mapped[ start+position : start+position+size ],
+            buffers = buffers[ key ]
+        )
+
+    return  attributes
+
 def open_obj( obj, file_name, force=False ):
     """
-    Retrieves the class attributes from an existing pickle file.
+    Retrieves the class attributes from an existing snapshot or pickle file.
 
     Arguments:
         obj             - object to write to
@@ -40,14 +179,14 @@ def open_obj( obj, file_name, force=False ):
 
     ##  Open a master file and copy all members.
 
-    instance    = pickle.load( gzip.open(file_name, "rb") )
+    attributes  = load_obj( file_name )
 
     ##  Check for discrepencies between object attributes.
 
     inst_keys   = []
     obj_keys    = []
 
-    for key in instance.__dict__:
+    for key in attributes:
         if key not in obj.__dict__:
             inst_keys.append( key )
             print( key + " was present in the file but not the class." )
@@ -66,5 +205,5 @@ def open_obj( obj, file_name, force=False ):
 
     ##  Copy members from the opened object.
 
-    for key in instance.__dict__:
-        obj.__dict__[ key ] = instance.__dict__[ key ]
+    for key in attributes:
+        obj.__dict__[ key ] = attributes[ key ]
@@ -0,0 +1,106 @@
+"""
+This file contains functions which read and write columnar catalogs.  A
+columnar catalog is a directory holding one .npy file for each column and a
+schema file which is simply the '#<' header of the equivalent ascii file:
+
+    catalog/
+        schema              #<  id          int64
+        id.npy              #<  alpha       float64
+        alpha.npy           #<  delta       float64
+        delta.npy
+
+Each column is memory mapped when read, so reading a few columns of a very wide
+catalog costs only the bytes of those columns.
+"""
+
+from ._imports import *
+
+##  ========================================================================  ##
+
+def read_columnar( dir_name, columns=None, where=None ):
+    """
+    This function reads a columnar catalog directory and returns a numpy record
+    array of the selected columns.  If where is given, it is computed from the
+    memory mapped columns it uses and only the selected rows are copied.
+
+    Parameters:
+        dir_name        - str
+            name of the catalog directory
+        columns         - list
+            names of the columns to read; if None, all columns are read
+        where           - str, list
+            condition on the columns which rows must satisfy ( see
+            selection.py )
+
+    Returns:
+        array           - numpy record array
+    """
+
+    dtype   = io.parse_header( os.path.join(dir_name, "schema") )[1]
+
+    if columns is None:
+        columns = dtype["names"]
+
+    ##  Memory map every column which is needed.
+
+    mapped  = {
+        name: np.load( os.path.join(dir_name, name + ".npy"), mmap_mode="r" )
+        for name in io.read_columns( columns, where, dtype["names"] )
+    }
+
+    ##  Select the rows from the columns used by the where condition.
+
+    rows    = slice( None )
+
+    if where is not None:
+
+        used    = io.where_columns( where, dtype["names"] )
+        size    = mapped[ used[0] ].size if len( used ) > 0 else 0
+        view    = np.zeros( size, dtype=io.sub_dtype(dtype, used) )
+
+        for name in used:
+            view[ name ]    = mapped[ name ]
+
+        rows    = np.flatnonzero( io.select( view, where ) )
+
+    ##  Copy the selected rows of each column into the array.
+
+    dtype   = io.sub_dtype( dtype, columns )
+    array   = None
+
+    for name in columns:
+
+        column  = mapped[ name ][ rows ]
+
+        if array is None:
+            array   = np.zeros( column.size, dtype=dtype )
+
+        array[name] = column
+
+    if array is None:
+        array   = np.zeros( 0, dtype=dtype )
+
+    return  array
+
+##  ========================================================================  ##
+
+def write_columnar( dir_name, array ):
+    """
+    This function writes a numpy record array to a columnar catalog directory.
+    Any existing columns in the directory are overwritten.
+
+    Parameters:
+        dir_name        - str
+            name of the catalog directory
+        array           - ndarray
+            numpy record array to write
+    """
+
+    os.makedirs( dir_name, exist_ok=True )
+
+    for name in array.dtype.names:
+        np.save( os.path.join(dir_name, name + ".npy"), array[name] )
+
+    ##  Write the schema last so that a directory with a schema is complete.
+
+    io.write( os.path.join(dir_name, "schema"), array[:0] )
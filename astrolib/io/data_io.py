@@ -19,7 +19,9 @@ from ._imports import *
 ##  ========================================================================  ##
 ##  Column Data
 
-def read( file_name, dtype=None ):
+def read(
+    file_name, dtype=None, columns=None, where=None, cache=False, workers=None
+):
     """
     This function reads an ascii file and returns a numpy record array.  If the
     dtype of the ascii data is not specified ( default ), the format of the data
@@ -35,51 +37,246 @@ def read( file_name, dtype=None ):
         ##  Here is another comment randomly in the file.
         3       3.13159         2.71828         Beethoven
 
+    The body is converted in bulk chunks of lines by io.parse_lines().  Lines
+    which cannot be converted are counted and left as rows of zeros.  If cache
+    is True, the parsed array is stored in the binary cache ( see cache.py )
+    and later reads of the unchanged file return a memory map of it instead.
+
+    If workers is given, the file is split into byte ranges on line boundaries
+    which are converted by a pool of that many processes and joined in order.
+
+    If where is given, only the rows which satisfy it are kept ( see
+    selection.py ).  The condition is applied to each chunk as it is read, so
+    the memory used follows the selected rows rather than the whole file.
+
+    If file_name is a directory, it is read as a columnar catalog ( see
+    columnar.py ).  Files ending in .parquet or .feather are read with pyarrow
+    ( see arrow_io.py ).
+
     Parameters:
         file_name       - str
-            name of ascii file
+            name of ascii file or columnar catalog directory
         dtype           - dict
             numpy dtype or numpy like dtype dictionary
+        columns         - list
+            names of the columns to read; if None, all columns are read
+        where           - str, list
+            condition on the columns which rows must satisfy, either as an
+            expression, e.g. "(mag_r < 24) & (delta > 2.1)", or as a list of
+            (column, operator, value) tuples, e.g. [("mag_r", "<", 24)]
+        cache           - bool
+            to use the binary cache of parsed files or not
+        workers         - int
+            number of processes used to parse the file
 
     Returns:
         array           - numpy record array
     """
 
-    ## Retrieve body of text and the dtype a text file.
+    ## Read columnar catalogs directly.
+
+    if os.path.isdir( file_name ):
+        return io.read_columnar( file_name, columns=columns, where=where )
+
+    ## Read Parquet and Feather files with pyarrow.
+
+    if io.parse_path( file_name )[2] in io.arrow_formats:
+        return io.read_arrow( file_name, columns=columns, where=where )
+
+    ## Return the cached array if the file has been read before.
+
+    if cache is True:
 
-    body, comments, fdtype   = io.parse_file( file_name )
+        array   = io.read_cache(
+            file_name, dtype=dtype, columns=columns, where=where
+        )
+
+        if array is not None:
+            return array
+
+    ## Retrieve the dtype from the header of the text file.  The requested
+    ## dtype is kept as it is part of the cache key.
+
+    requested   = dtype
+
+    if dtype is None:
+        dtype   = io.parse_header( file_name )[1]
+
+    adtype      = dtype
+
+    if columns is not None:
+        adtype  = io.sub_dtype( dtype, columns )
+
+    chunks      = io.iter_read(
+        file_name, dtype=dtype, columns=columns, where=where, workers=workers
+    )
+
+    ## If the statistics sidecar lets the read skip blocks, counting the lines
+    ## would read the whole file, so the selected chunks are joined instead.
+
+    if where is not None and not isinstance( where, str ) and \
+       io.read_stats( file_name ) is not None:
+
+        array   = np.concatenate( [ np.zeros( 0, dtype=adtype ) ] + [
+            chunk.astype( adtype, copy=False ) for chunk in chunks
+        ])
+
+    ## Otherwise, create an array with a row for every line of the file and
+    ## fill it with chunks of text.  The unused rows are trimmed afterwards,
+    ## and the rows which are never filled are never touched in memory.
+
+    else:
+
+        array   = np.zeros( io.count_lines( file_name ), dtype=adtype )
+        size    = 0
+
+        for chunk in chunks:
+
+            array[size:size+chunk.size] = chunk
+            size                       += chunk.size
+
+        array.resize( size, refcheck=False )
+
+    if cache is True:
+        io.write_cache(
+            file_name, array, dtype=requested, columns=columns, where=where
+        )
+
+    return array
+
+##  ========================================================================  ##
+
+def iter_read(
+    file_name, chunk_rows=65536, dtype=None, columns=None, where=None,
+    workers=None
+):
+    """
+    This generator reads an ascii file in chunks and yields a numpy record array
+    for each chunk, so that files larger than memory may be processed in a
+    single pass.  The header is parsed once, as in read(), and each chunk holds
+    the data of at most chunk_rows lines of the file.
+
+        for chunk in io.iter_read( "catalog.cat", chunk_rows=10**6 ):
+            bright  = chunk[ chunk["mag_r"] < 24 ]
+
+    If workers is given, the file is instead split into byte ranges on line
+    boundaries which are converted by a pool of that many processes, and one
+    chunk is yielded for each range in order.  If where is a list of filters
+    and the file was written with stats=True, only the blocks of the file
+    which may hold selected rows are read ( see stats.py ).
+
+    Parameters:
+        file_name       - str
+            name of ascii file
+        chunk_rows      - int
+            number of lines of the file to read per chunk
+        dtype           - dict
+            numpy dtype or numpy like dtype dictionary
+        columns         - list
+            names of the columns to read; if None, all columns are read
+        where           - str, list
+            condition on the columns which rows must satisfy ( see read() )
+        workers         - int
+            number of processes used to parse the file
+
+    Yields:
+        chunk           - numpy record array
+    """
+
+    ## Retrieve the dtype from the header of the text file.
+
+    comments, fdtype    = io.parse_header( file_name )
 
     if dtype is None:
         dtype   = fdtype
 
-    ## Create an array and fill it with text.
+    ## Columns used by the where condition are read as well and dropped once
+    ## the rows are selected.
 
-    array       = np.zeros( len(body), dtype=dtype )
+    parsed      = io.read_columns( columns, where, np.dtype(dtype).names )
     bad_lines   = 0
 
-    for i in range(len( body )):
+    ## Only the blocks which may hold selected rows are read if the file has
+    ## a statistics sidecar ( see stats.py ).  Otherwise, several ranges are
+    ## made per worker so that the work stays balanced.
+
+    ranges      = None
+
+    if where is not None and not isinstance( where, str ):
+
+        stats   = io.read_stats( file_name )
+
+        if stats is not None:
+            ranges  = io.find_blocks( stats, where )
+
+    if ranges is None and workers is not None:
+
+        offsets = io.split_file( file_name, 4 * workers )
+        ranges  = list( zip( offsets[:-1], offsets[1:] ) )
+
+    ## Convert the text chunk by chunk.
+
+    if ranges is None:
+
+        with open( file_name, "r" ) as in_file:
+
+            while True:
+
+                lines   = list( itertools.islice( in_file, chunk_rows ) )
+
+                if len( lines ) == 0:
+                    break
+
+                chunk, bad  = io.parse_lines( lines, dtype, columns=parsed )
+                bad_lines  += bad
+
+                yield io.apply_where( chunk, where, columns=columns )
+
+    ## Or convert the byte ranges one at a time.
 
-        ## Write line to array if possible.
+    elif workers is None:
 
-        try:
-            array[i]    = tuple( body[i] )
+        for start, stop in ranges:
 
-        except:
-            bad_lines += 1
+            chunk, bad  = io.parse_range(
+                file_name, start, stop, dtype, columns=columns, where=where
+            )
+            bad_lines  += bad
+
+            yield chunk
+
+    ## Or convert the byte ranges in parallel.
+
+    else:
+
+        with concurrent.futures.ProcessPoolExecutor( workers ) as pool:
+
+            results = pool.map(
+                io.parse_range,
+                itertools.repeat( file_name ),
+                [ start for start, stop in ranges ],
+                [ stop for start, stop in ranges ],
+                itertools.repeat( dtype ), itertools.repeat( columns ),
+                itertools.repeat( where )
+            )
+
+            for chunk, bad in results:
+
+                bad_lines  += bad
+
+                yield chunk
 
     ## Inform user to lines that were not written.
 
     if bad_lines > 0:
         print( "%i lines not read in %s." % (bad_lines, file_name) )
 
-    return array
-
 ##  ========================================================================  ##
 
 def write(
     file_name, array, header=True, space=3,
     sci=False, ipad=6, fpad=8.6, spad=32,
-    keep=False
+    keep=False, format="ascii", align=True, stats=False
 ):
     """
     This function writes an ascii data file from given numpy record array with a
@@ -90,6 +287,10 @@ def write(
         #<   col_name_2          float32
         #<   col_name_3          U27
 
+    If align is True, the width of each column is found from the data so that
+    the columns line up, and ipad, spad and the width of fpad are not used.
+    The lines are formatted and written in large blocks.
+
     Parameters:
         file_name   - str
             name of ascii file
@@ -107,40 +308,76 @@ def write(
             format for floats
         spad        - int
             format for strings ( currently pretty lame )
+        format      - str
+            "ascii" or "columnar" ( see columnar.py ); files ending in .parquet
+            or .feather are always written with pyarrow ( see arrow_io.py )
+        align       - bool
+            to find the column widths from the data or not
+        stats       - bool
+            to write a sidecar of the byte range and the minimum and maximum
+            of each numeric column of every block, so that reads filtered by
+            where may skip blocks ( see stats.py ); this cannot be used with
+            keep, as the rows written later would not be in the sidecar
     """
 
+    if keep is True and stats is True:
+        raise ValueError( "stats=True cannot be used with keep=True." )
+
+    if format == "columnar":
+        return io.write_columnar( file_name, array )
+
+    if io.parse_path( file_name )[2] in io.arrow_formats:
+        return io.write_arrow( file_name, array )
+
     out_file    = open( file_name, "w" )
 
     ## Determine line format from array.
 
+    widths      = None
+
+    if align is True:
+        widths  = io.get_widths( array, sci=sci, fpad=fpad )
+
     dstring     = io.get_dstring(
-        array.dtype, space=space, sci=sci, ipad=ipad, fpad=fpad, spad=spad
+        array.dtype, space=space, sci=sci, ipad=ipad, fpad=fpad, spad=spad,
+        widths=widths
     )
 
-    ##  I'd like to write this rather than using io.get_dstring() above.  This
-    ##  is intended so that we can straighten up the gaps between columns.
-    ##
-    ##  1.  turn each column to string
-    ##  2.  find max length of each column
-    ##  3.  format including knowledge of max length
-
     ## Write header to file.
 
     if header is True:
+        io.write_header( out_file, array.dtype )
 
-        for name in list( array.dtype.names ):
+    ## Write formatted lines to file in blocks.  Each block is formatted by a
+    ## single string operation on the flattened rows of the block.
 
-            out_file.write( "#<  " + name )
-            out_file.write( (25-len(name)) * " " )
-            out_file.write( str(array.dtype[name]) )
-            out_file.write( "\n" )
+    if stats is True:
 
-    ## Write formatted lines to file and close.
+        out_file.flush()
 
-    for i in range(len( array )):
+        low, high   = io.block_stats( array[:0] )
+        offsets     = [ out_file.tell() ]
+        minimum     = [ low ]
+        maximum     = [ high ]
 
-        out_file.write( dstring % tuple(array[i]) )
-        out_file.write( "\n" )
+    for start in range( 0, len(array), 65536 ):
+
+        block   = array[start:start+65536]
+        rows    = block.tolist()
+        values  = tuple( itertools.chain.from_iterable(rows) )
+        text    = ((dstring + "\n") * len(rows)) % values
+
+        out_file.write( text )
+
+        ## Keep the byte range and the statistics of the block.
+
+        if stats is True:
+
+            low, high   = io.block_stats( block )
+
+            offsets.append( offsets[-1] + len(text.encode(out_file.encoding)) )
+            minimum.append( low )
+            maximum.append( high )
 
     ##  If keep is True, return the file stream.
     ##  Also return the dstring for consistent writing.
@@ -152,6 +389,12 @@ def write(
     else:
         out_file.close()
 
+    if stats is True:
+        io.write_stats(
+            file_name, offsets, np.concatenate( minimum ),
+            np.concatenate( maximum )
+        )
+
 ##  ========================================================================  ##
 
 def add_column( original, col_name, col_format, data=None, after=None ):
@@ -168,59 +411,100 @@ def add_column( original, col_name, col_format, data=None, after=None ):
             column format
         data            - new column array
             data to add
+        after           - str, int
+            column name after which to place the new column; 0 places it first
+            and None or -1 places it last
 
     Returns:
         numpy record array
     """
 
-    ##  If after == None, place the column in the -1th position.
+    return add_columns(
+        original, { col_name: (col_format, data) }, after=after
+    )
+
+def add_columns( original, columns, after=None, contiguous=True ):
+    """
+    This function adds several columns to an existing numpy record array at
+    once.  The new dtype is built once and each existing column is copied
+    exactly once, no matter how many columns are added.
+
+        catalog = io.add_columns(
+            catalog, { "frame": ("int64", None), "S": ("float64", S) },
+            after="id"
+        )
+
+    If contiguous is False, nothing is copied.  A composite of the original
+    columns and the new columns is returned instead ( see composite ).
+
+    Parameters:
+        original        - numpy array
+            original numpy record array
+        columns         - dict
+            ( format, data ) of each new column by column name, in order; if
+            data is None, the column is filled with zeros
+        after           - str, int
+            column name after which to place the new columns; 0 places them
+            first and None or -1 places them last
+        contiguous      - bool
+            to return a new numpy record array or a composite
+
+    Returns:
+        numpy record array or composite
+    """
+
+    ##  Find the position of the new columns.
+
+    names   = list( original.dtype.names )
 
     if after is None or after == -1:
+        position    = len( names )
+
+    elif after == 0 or after == "0":
+        position    = 0
 
-        new_dtype = {
-            "names":    [
-                original.dtype.names[i] for i in range( len(original.dtype) )
-            ],
-            "formats":  [
-                original.dtype[i]       for i in range( len(original.dtype) )
-            ]
-        }
+    elif after in names:
+        position    = names.index( after ) + 1
 
-        new_dtype["names"].append( col_name )
-        new_dtype["formats"].append( col_format )
+    else:
+        position    = len( names )
+
+    ##  Create the new dtype.
 
-    ##  If after == 0, place the column in the 0th position.
+    new_names   = names[:position] + list( columns ) + names[position:]
+    formats     = []
 
-    if after == 0 or after == "0":
+    for name in new_names:
 
-        new_dtype = { "names": [col_name], "formats": [col_format] }
+        if name in columns:
+            formats.append( np.dtype(columns[name][0]) )
+        else:
+            formats.append( original.dtype[name] )
 
-        for col in original.dtype.names:
+    new_dtype   = { "names": new_names, "formats": formats }
 
-            new_dtype["names"].append( col )
-            new_dtype["formats"].append( original.dtype[col] )
+    ##  Return a composite without copying.
 
-    ##  Otherwise, put the new column after the column specified by after.
+    if contiguous is False:
 
-    new_dtype   = { "names": [], "formats": [] }
+        data    = collections.OrderedDict()
 
-    found       = False
+        for name, col_format in zip( new_names, formats ):
 
-    for i in range( len(original.dtype) ):
+            if name not in columns:
+                data[ name ]    = original[ name ]
 
-        new_dtype["names"].append( original.dtype.names[i] )
-        new_dtype["formats"].append( original.dtype[i] )
+            elif columns[name][1] is None:
+                data[ name ]    = np.zeros( original.size, dtype=col_format )
 
-        if original.dtype.names[i] == after:
-            found   = True
-            new_dtype["names"].append( col_name )
-            new_dtype["formats"].append( col_format )
+            else:
+                data[ name ]    = np.asarray(
+                    columns[name][1], dtype=col_format
+                )
 
-    if found is False:
-        new_dtype["names"].append( col_name )
-        new_dtype["formats"].append( col_format )
+        return composite( data )
 
-    ##  Declare the new array.
+    ##  Declare the new array and copy each column once.
 
     new_array = np.zeros( original.size, dtype=new_dtype )
 
@@ -228,31 +512,217 @@ def add_column( original, col_name, col_format, data=None, after=None ):
 
         new_array[col] = original[col]
 
-    if data is not None:
+    for col in columns:
 
-        new_array[col_name] = data
+        if columns[col][1] is not None:
+            new_array[col] = columns[col][1]
 
     return new_array
 
 ##  ========================================================================  ##
 
-def start_file( file_name, array ):
+class composite:
+    """
+    The composite class holds a set of equally long column arrays which behave
+    like the columns of a numpy record array, without being copied into one.
+    Columns are taken from and written to the arrays they were made from, so a
+    composite returned by add_columns() shares the columns of the original.
+
+        composite[ "alpha" ]            - the column array
+        composite[ ["id", "alpha"] ]    - a composite of fewer columns
+        composite[ 10:20 ]              - a composite of fewer rows
+        composite.to_array()            - a numpy record array
+    """
 
-    out_file    = open( file_name, "w" )
+    def __init__( self, columns ):
+
+        self.columns    = collections.OrderedDict( columns )
+
+        self.dtype      = np.dtype([
+            ( name, self.columns[name].dtype ) for name in self.columns
+        ])
+        self.size       = 0
+
+        for name in self.columns:
+            self.size   = self.columns[ name ].size
+            break
+
+    def __len__( self ):
+
+        return  self.size
+
+    def __getitem__( self, key ):
+
+        if isinstance( key, str ):
+            return  self.columns[ key ]
+
+        if isinstance( key, list ) and all( isinstance(k, str) for k in key ):
+            return  composite( [ (name, self.columns[name]) for name in key ] )
+
+        if isinstance( key, (int, np.integer) ):
+            return  self[ key:key+1 or None ].to_array()[0]
+
+        return  composite(
+            [ (name, self.columns[name][key]) for name in self.columns ]
+        )
+
+    def __setitem__( self, key, value ):
+
+        self.columns[ key ][...]    = value
+
+    def to_array( self ):
+        """
+        Copy the columns into a numpy record array.
+        """
+
+        array   = np.zeros( self.size, dtype=self.dtype )
 
-    for name in list( array.dtype.names ):
+        for name in self.columns:
+            array[ name ]   = self.columns[ name ]
+
+        return  array
+
+##  ========================================================================  ##
+
+def write_header( out_file, dtype ):
+    """
+    Write the '#<' header of a numpy dtype to an open file.
+    """
+
+    dtype   = np.dtype( dtype )
+
+    for name in list( dtype.names ):
 
         out_file.write( "#<  " + name )
         out_file.write( (25-len(name)) * " " )
-        out_file.write( str(array.dtype[name]) )
+        out_file.write( str(dtype[name]) )
         out_file.write( "\n" )
 
+def start_file( file_name, array ):
+
+    out_file    = open( file_name, "w" )
+
+    io.write_header( out_file, array.dtype )
+
 def write_to( out_file, dstring, row_data ):
 
     out_file.write( dstring % tuple(row_data) )
     out_file.write( "\n" )
     out_file.flush()
 
+##  ========================================================================  ##
+
+class catalog_writer:
+    """
+    The catalog_writer class writes an ascii catalog row by row or in batches
+    of rows without a system call per row.  The '#<' header is written when the
+    file is opened and formatted lines are buffered until buffer_size bytes are
+    waiting.  <catalog_writer>.checkpoint() flushes and syncs the file to disk
+    and returns the number of rows which are then safely in the file.
+
+        with io.catalog_writer( "sources.photo", out_dtype ) as writer:
+
+            for j, source in enumerate( sources ):
+                writer.write( row )
+                if j % 10000 == 0:
+                    writer.checkpoint()
+
+    If append is True and the file exists, rows are added to the end of the
+    file without writing a new header, which allows a run to be resumed.  The
+    column formats are the fixed ipad, fpad and spad formats of io.write().
+    """
+
+    def __init__(
+        self, file_name, dtype, buffer_size=2**22, append=False,
+        space=3, sci=False, ipad=6, fpad=8.6, spad=32
+    ):
+
+        self.file_name      = file_name                 ##  file name
+        self.dtype          = np.dtype( dtype )         ##  row dtype
+        self.buffer_size    = buffer_size               ##  buffer size [bytes]
+
+        self.buffer         = []                        ##  formatted text
+        self.buffered       = 0                         ##  bytes in buffer
+        self.pending        = 0                         ##  rows in buffer
+        self.rows           = 0                         ##  rows written
+        self.committed      = 0                         ##  rows synced
+
+        self.dstring        = io.get_dstring(
+            self.dtype, space=space, sci=sci, ipad=ipad, fpad=fpad, spad=spad
+        )
+
+        ##  Open the file and write the header.
+
+        if append is True and os.path.isfile( file_name ):
+            self.out_file   = open( file_name, "a" )
+
+        else:
+            self.out_file   = open( file_name, "w" )
+            io.write_header( self.out_file, self.dtype )
+
+    def __enter__( self ):
+
+        return self
+
+    def __exit__( self, *args ):
+
+        self.close()
+
+    def write( self, data ):
+        """
+        Write a single row or a numpy record array of rows.
+        """
+
+        if isinstance( data, np.ndarray ) and data.ndim > 0:
+            rows    = data.tolist()
+        else:
+            rows    = [ tuple(data) ]
+
+        text    = ((self.dstring + "\n") * len(rows)) % tuple(
+            itertools.chain.from_iterable( rows )
+        )
+
+        self.buffer.append( text )
+        self.buffered  += len( text )
+        self.pending   += len( rows )
+
+        if self.buffered >= self.buffer_size:
+            self.flush()
+
+    def flush( self ):
+        """
+        Write the buffered lines to the file.
+        """
+
+        self.out_file.write( "".join(self.buffer) )
+        self.out_file.flush()
+
+        self.rows      += self.pending
+        self.buffer     = []
+        self.buffered   = 0
+        self.pending    = 0
+
+    def checkpoint( self ):
+        """
+        Flush the buffer and sync the file to disk.  Returns the number of rows
+        committed to the file.
+        """
+
+        self.flush()
+        os.fsync( self.out_file.fileno() )
+        self.committed  = self.rows
+
+        return  self.committed
+
+    def close( self ):
+        """
+        Commit any buffered lines and close the file.
+        """
+
+        if not self.out_file.closed:
+            self.checkpoint()
+            self.out_file.close()
+
 ##  ========================================================================  ##
 ##  ========================================================================  ##
 ##  Configuration Files
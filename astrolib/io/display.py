@@ -4,6 +4,11 @@ This module contains functions for displaying progress and timing of operations.
 
 from ._imports import *
 
+import  atexit
+import  contextlib
+import  json
+import  tracemalloc
+
 ##  ========================================================================  ##
 
 def progress( i, length, step=1, alert=None, tabs=0 ):
@@ -36,19 +41,178 @@ def progress( i, length, step=1, alert=None, tabs=0 ):
 
 ##  ========================================================================  ##
 
+class progress_bar:
+    """
+    The progress_bar class displays the progress of a loop with its rate in
+    items per second and the time remaining.  The bar is redrawn at most once
+    every interval seconds, and the clock itself is only read every so many
+    items, so a bar costs almost nothing on loops of millions of items.  When
+    enabled is False, or stdout is not a terminal, the bar does nothing at all.
+
+        for i in io.progress_bar( range(Ax.size), alert="Correlating..." ):
+            ...
+
+        bar     = io.progress_bar( M.size, alert="Cleaning..." )
+        for i in range( M.size ):
+            bar.update()
+        bar.close()
+
+    Bars may be nested, in which case the bars of the outer loops are shown to
+    the left of the bar of the inner loop.
+    """
+
+    active      = []                                ##  bars being displayed
+    drawn       = 0.0                               ##  time of the last draw
+
+    def __init__( self, items, alert=None, interval=0.5, enabled=None ):
+
+        if isinstance( items, int ):
+            items   = range( items )
+
+        self.items  = items
+        self.total  = len( items ) if hasattr( items, "__len__" ) else None
+
+        if enabled is None:
+            enabled = sys.stdout.isatty()
+
+        self.enabled    = enabled
+        self.interval   = interval
+        self.count      = 0
+
+        if alert is not None:
+            print( alert )
+            sys.stdout.flush()
+
+        if self.enabled is False:
+            self.update = self.skip
+            return
+
+        self.start      = time.perf_counter()
+        self.check      = 1                         ##  count to read clock at
+
+        progress_bar.active.append( self )
+
+    def __iter__( self ):
+
+        if self.enabled is False:
+            return  iter( self.items )
+
+        return  self.iterate()
+
+    def iterate( self ):
+
+        try:
+            for item in self.items:
+                yield item
+                self.count += 1
+                if self.count >= self.check:
+                    self.tick()
+        finally:
+            self.close()
+
+    def __enter__( self ):
+        return self
+
+    def __exit__( self, *args ):
+        self.close()
+
+    def skip( self, n=1 ):
+        pass
+
+    def update( self, n=1 ):
+
+        self.count += n
+
+        if self.count >= self.check:
+            self.tick()
+
+    def tick( self ):
+        """
+        Reads the clock, redraws the bars if interval seconds have passed since
+        the bar started and since the last draw, and sets how many items pass
+        until the clock is read again, so that it is read about ten times per
+        interval.
+        """
+
+        now     = time.perf_counter()
+        rate    = self.count / max( now - self.start, 1e-9 )
+
+        self.check  = self.count + max( 1, int(rate * self.interval / 10) )
+
+        if min( now - self.start, now - progress_bar.drawn ) >= self.interval:
+            progress_bar.drawn  = now
+            self.draw( now )
+
+    def text( self, now ):
+        """
+        Returns the text of the bar.
+        """
+
+        rate    = self.count / max( now - self.start, 1e-9 )
+
+        if self.total is None:
+            return  "%i   %.3g/s" % ( self.count, rate )
+
+        complete    = self.count / max( self.total, 1 )
+        bar         = int( 19 * complete ) * "=" + ">"
+        space       = ( 20 - len(bar) ) * " "
+        eta         = "--:--:--"
+
+        if self.count > 0:
+            eta = time.strftime(
+                "%H:%M:%S", time.gmtime( (self.total - self.count) / rate )
+            )
+
+        return  "[" + bar + space + "]   {:.1%}   {:.3g}/s   ETA {}".format(
+            complete, rate, eta
+        )
+
+    def draw( self, now ):
+        """
+        Draws the bars of the outer loops as counts followed by the bar of the
+        innermost loop.
+        """
+
+        outer   = [
+            "%i/%s" % ( bar.count, bar.total or "?" )
+            for bar in progress_bar.active[:-1]
+        ]
+        line    = " | ".join( outer + [ progress_bar.active[-1].text(now) ] )
+        columns = shutil.get_terminal_size().columns - 1
+
+        print( line[:columns].ljust( columns ), end="\r" )
+        sys.stdout.flush()
+
+    def close( self ):
+        """
+        Clears the bar from the terminal.
+        """
+
+        if self not in progress_bar.active:
+            return
+
+        progress_bar.active.remove( self )
+
+        print( ( shutil.get_terminal_size().columns - 1 ) * " ", end="\r" )
+        sys.stdout.flush()
+
+        progress_bar.drawn  = 0.0
+
+##  ========================================================================  ##
+
 class timer:
     """
     The timer class consists of a dictionary of timers.  Timer initializes the
-    dictionary with the key "net" which starts a time.clock().  Intermediate
-    processes may be timed by adding an element to the dictionary with the
-    methods <timer>.start( "process_name" ) and <Timer>.end( "process_name" )
-    upon which the time from start to end is printed to the terminal.  The net
-    time of <timer> is printed upon the call <timer>.close().
+    dictionary with the key "net" which starts a time.perf_counter().
+    Intermediate processes may be timed by adding an element to the dictionary
+    with the methods <timer>.start( "process_name" ) and <Timer>.end(
+    "process_name" ) upon which the time from start to end is printed to the
+    terminal.  The net time of <timer> is printed upon the call <timer>.close().
     """
 
     def __init__( self, alert=None ):
 
-        self.timers     = { "net": time.clock() }       # "timer_name": time_0
+        self.timers     = { "net": time.perf_counter() }  # "timer_name": time_0
 
         if alert is not None:
 
@@ -57,7 +221,7 @@ class timer:
 
     def start( self, timer_name, alert=None ):
 
-        self.timers[ timer_name ] = time.clock()
+        self.timers[ timer_name ] = time.perf_counter()
 
         if alert is not None:
 
@@ -71,7 +235,7 @@ class timer:
             print( alert )
             sys.stdout.flush()
 
-        dt = ( time.clock() - self.timers[ timer_name ] ) / 60
+        dt = ( time.perf_counter() - self.timers[ timer_name ] ) / 60
 
         print( "Time: %.2f minutes." % dt )
         sys.stdout.flush()
@@ -87,7 +251,182 @@ class timer:
 
             print( alert )
 
-        Dt = ( time.clock() - self.timers[ "net" ] ) / 60
+        Dt = ( time.perf_counter() - self.timers[ "net" ] ) / 60
 
         print( "Net Time: %.2f minutes." % Dt + end )
         sys.stdout.flush()
+
+##  ========================================================================  ##
+
+class profiler:
+    """
+    The profiler class times nested, named spans of a program.  Each span is
+    kept by its path of parent span names, with its number of calls and total
+    time and, if memory is True, the peak memory allocated within the span as
+    traced by tracemalloc.  Spans are opened with <profiler>.span( name ),
+    which is both a context manager and a decorator, or with start( name ) and
+    stop().
+
+        @io.profile.span( "mcc.create" )
+        def create( fits_file, configs_file, path="." ):
+
+            with io.profile.span( "read" ):
+                configs = io.read( configs_file )
+
+    The spans may be printed with summary(), or written with write_json() or
+    as folded stacks for flame graph tools with write_folded().
+    """
+
+    def __init__( self, memory=False, enabled=True ):
+
+        self.memory     = memory
+        self.enabled    = enabled
+        self.spans      = collections.OrderedDict() # path: [calls, time, peak]
+        self.stack      = []                        # [path, t_0, mem_0, peak]
+
+    def start( self, name ):
+
+        if self.enabled is False:
+            return
+
+        memory  = 0
+
+        if self.memory is True:
+
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+
+            ##  Pass the peak so far to the parent span and measure the peak
+            ##  of this span from here.
+
+            memory, peak    = tracemalloc.get_traced_memory()
+
+            if len( self.stack ) > 0:
+                self.stack[-1][3]   = max( self.stack[-1][3], peak )
+
+            tracemalloc.reset_peak()
+
+        path    = ( self.stack[-1][0] if len( self.stack ) > 0 else () )
+
+        self.stack.append(
+            [ path + (name,), time.perf_counter(), memory, memory ]
+        )
+
+    def stop( self ):
+
+        if self.enabled is False or len( self.stack ) == 0:
+            return
+
+        path, start, memory, peak   = self.stack.pop()
+        elapsed                     = time.perf_counter() - start
+
+        if self.memory is True and tracemalloc.is_tracing():
+
+            peak    = max( peak, tracemalloc.get_traced_memory()[1] )
+
+            if len( self.stack ) > 0:
+                self.stack[-1][3]   = max( self.stack[-1][3], peak )
+
+        span        = self.spans.setdefault( path, [0, 0.0, 0] )
+        span[0]    += 1
+        span[1]    += elapsed
+        span[2]     = max( span[2], peak - memory )
+
+    @contextlib.contextmanager
+    def span( self, name ):
+
+        self.start( name )
+
+        try:
+            yield self
+        finally:
+            self.stop()
+
+    def reset( self ):
+
+        self.spans.clear()
+        del self.stack[:]
+
+    ##  ====================================================================  ##
+
+    def report( self ):
+        """
+        Returns a list of dictionaries, one per span, holding the path of the
+        span, its calls, its total time, its time outside of its child spans and
+        its peak memory in bytes.
+        """
+
+        children    = collections.defaultdict( float )
+
+        for path, ( calls, total, peak ) in self.spans.items():
+            children[ path[:-1] ]  += total
+
+        return  [
+            {
+                "path":     list( path ),
+                "calls":    calls,
+                "total":    total,
+                "self":     max( total - children[path], 0.0 ),
+                "peak":     peak,
+            }
+            for path, ( calls, total, peak ) in sorted( self.spans.items() )
+        ]
+
+    def summary( self ):
+        """
+        Prints the spans as an indented table.
+        """
+
+        print( "%-40s %8s %12s %12s %12s" % (
+            "span", "calls", "total (s)", "self (s)", "peak (MB)"
+        ))
+
+        for span in self.report():
+
+            name    = "  " * ( len(span["path"]) - 1 ) + span["path"][-1]
+
+            print( "%-40s %8i %12.3f %12.3f %12.1f" % (
+                name[:40], span["calls"], span["total"], span["self"],
+                span["peak"] / 2**20
+            ))
+
+        sys.stdout.flush()
+
+    def write_json( self, file_name ):
+
+        with open( file_name, "w" ) as out_file:
+            json.dump( { "spans": self.report() }, out_file, indent=4 )
+
+    def write_folded( self, file_name ):
+        """
+        Writes each span as a line of its ';' separated path and its time
+        outside of its child spans in microseconds, which is the input of
+        flamegraph.pl and speedscope.
+        """
+
+        with open( file_name, "w" ) as out_file:
+
+            for span in self.report():
+                out_file.write( "%s %i\n" % (
+                    ";".join( span["path"] ), round( span["self"] * 1e6 )
+                ))
+
+    def write( self, file_name ):
+        """
+        Writes folded stacks if file_name ends with .folded and JSON otherwise.
+        """
+
+        if file_name.endswith( ".folded" ):
+            self.write_folded( file_name )
+        else:
+            self.write_json( file_name )
+
+##  ========================================================================  ##
+
+##  The profiler used throughout astrolib.  If ASTROLIB_PROFILE is set to a
+##  file name, the spans are written to it when python exits.
+
+profile     = profiler( memory="ASTROLIB_PROFILE_MEMORY" in os.environ )
+
+if "ASTROLIB_PROFILE" in os.environ:
+    atexit.register( profile.write, os.environ["ASTROLIB_PROFILE"] )
@@ -94,6 +94,351 @@ def parse_file( file_name ):
 
 ##  ========================================================================  ##
 
+def parse_header( file_name ):
+    """
+    This function parses only the header of an ascii file for the comments and
+    dtype.  Unlike parse_file(), this stops reading at the first line of data,
+    so '#<' lines are expected to come before the body of the file.
+
+    Returns:
+        comments    - list
+            This is a 1-D list of the comments found before the body.
+        dtype       - dictionary
+            This is a numpy like dtype dictionary.
+
+    Parameters:
+        file_name   - str
+            This is the path to the ascii file to read.
+    """
+
+    comments    = []
+    dtype       = { "names": [], "formats": [] }
+
+    with open( file_name, "r" ) as in_file:
+
+        for text in in_file:
+
+            line    = text.split()
+
+            if len( line ) == 0:
+                continue
+
+            if line[0] == "#<":
+
+                dtype["names"].append( line[1] )
+                dtype["formats"].append( line[2] )
+
+            elif line[0][0] == "#":
+
+                comments.append( text.replace("\n","") )
+
+            else:
+                break
+
+    ## Set the dtype to None if it has no length.
+
+    if len( dtype["names"] ) == 0:
+
+        dtype = None
+
+    return comments, dtype
+
+##  ========================================================================  ##
+
+def parse_lines( lines, dtype, columns=None ):
+    """
+    This function converts a list of text lines into a numpy record array.  The
+    lines are converted in bulk by numpy's C-level loader, which skips lines
+    starting with '#' and drops any trailing '#' comments.  If the bulk
+    conversion fails, the lines are converted one at a time so that bad lines
+    may be counted.  As with read(), bad lines are left as rows of zeros.  If
+    columns is given, only those columns are converted.
+
+    Returns:
+        array       - numpy record array
+            This is the array of converted lines.
+        bad_lines   - int
+            This is the number of lines which could not be converted.
+
+    Parameters:
+        lines       - list
+            This is a list of text lines from an ascii file.
+        dtype       - dict
+            This is a numpy dtype or numpy like dtype dictionary.
+        columns     - list
+            This is a list of the names of the columns to convert.
+    """
+
+    dtype   = np.dtype( dtype )
+    usecols = None
+
+    if columns is not None:
+        usecols = [ dtype.names.index( name ) for name in columns ]
+        dtype   = io.sub_dtype( dtype, columns )
+
+    ## Convert all lines at once.
+
+    if dtype.names is not None:
+
+        try:
+            return np.loadtxt(
+                lines, dtype=dtype, comments="#", usecols=usecols, ndmin=1
+            ), 0
+
+        except ( ValueError, TypeError ):
+            pass
+
+    ## Otherwise, split the body from the comments and convert line by line.
+
+    body    = []
+
+    for text in lines:
+
+        line    = text.split()
+
+        if len( line ) == 0 or line[0][0] == "#":
+            continue
+
+        for j in range( len(line) ):
+            if "#" in line[j]:
+                line    = line[:j]
+                break
+
+        if usecols is not None:
+            line    = [ line[j] for j in usecols if j < len( line ) ]
+
+        body.append( line )
+
+    array       = np.zeros( len(body), dtype=dtype )
+    bad_lines   = 0
+
+    for i in range( len(body) ):
+
+        try:
+            array[i]    = tuple( body[i] )
+
+        except:
+            bad_lines += 1
+
+    return array, bad_lines
+
+##  ========================================================================  ##
+
+def count_lines( file_name, block_size=2**24 ):
+    """
+    This function counts the lines of a file by scanning for newlines in large
+    binary blocks.  This is an upper limit on the number of rows in the file.
+    """
+
+    lines   = 0
+    last    = b"\n"
+
+    with open( file_name, "rb" ) as in_file:
+
+        block   = in_file.read( block_size )
+
+        while block:
+
+            lines  += block.count( b"\n" )
+            last    = block[-1:]
+            block   = in_file.read( block_size )
+
+    ## Count a final line with no newline.
+
+    if last != b"\n":
+        lines  += 1
+
+    return lines
+
+def count_rows( file_name, exact=True, sample_size=2**20, block_size=2**22 ):
+    """
+    This function counts the rows of data in a file, which are all lines that
+    are neither blank nor start with '#'.  The lines are scanned in large
+    binary blocks.  If exact is False, the rows are only counted in the first
+    sample_size bytes of the file and scaled up by the size of the file.
+    """
+
+    size    = os.path.getsize( file_name )
+    rows    = 0
+    scanned = 0
+
+    if exact is False:
+        block_size  = min( block_size, sample_size )
+
+    with open( file_name, "rb" ) as in_file:
+
+        for offset, block in iter_blocks( in_file, block_size ):
+
+            rows       += count_block( block )
+            scanned    += len( block )
+
+            if exact is False and scanned >= sample_size:
+                return int( round( rows * size / scanned ) )
+
+    return rows
+
+def iter_blocks( in_file, block_size=2**22, stop=None ):
+    """
+    This generator reads an open binary file from its current position up to
+    the byte offset stop, or the end of the file, in blocks of about block_size
+    bytes and yields ( offset, block ), where offset is the position of the
+    block in the file.  Each block holds whole lines only, and the last line is
+    given a newline if it has none.
+    """
+
+    offset  = in_file.tell()
+    rest    = b""
+
+    while True:
+
+        size    = block_size
+
+        if stop is not None:
+            size    = min( block_size, stop - offset - len(rest) )
+
+        block   = in_file.read( size ) if size > 0 else b""
+
+        if len( block ) == 0:
+            break
+
+        ## Keep any partial line for the next block.
+
+        block       = rest + block
+        end         = block.rfind( b"\n" ) + 1
+        block, rest = block[:end], block[end:]
+
+        if end > 0:
+            yield offset, block
+            offset     += end
+
+    if len( rest ) > 0:
+        yield offset, rest + b"\n"
+
+def count_block( block ):
+    """
+    This function counts the rows of data in a block of text which ends with a
+    newline.
+    """
+
+    return find_rows( block ).size
+
+def find_rows( block ):
+    """
+    This function returns the offsets within a block of text, which ends with a
+    newline, of the first character of every row of data.  The first character
+    of every line, after any spaces and tabs, is found with numpy so that the
+    lines are never split in python.
+    """
+
+    text    = np.frombuffer( block, dtype=np.uint8 )
+
+    if text.size == 0:
+        return np.zeros( 0, dtype="int64" )
+
+    ## Find the start of each line and skip its leading spaces and tabs.  Each
+    ## line ends with a newline, so this never runs past the block.
+
+    starts  = np.concatenate( ([0], np.flatnonzero( text[:-1] == 10 ) + 1) )
+    first   = text[ starts ]
+    space   = ( first == 32 ) | ( first == 9 )
+
+    while np.any( space ):
+
+        starts[ space ]    += 1
+        first               = text[ starts ]
+        space               = ( first == 32 ) | ( first == 9 )
+
+    ## Keep lines which start with neither '#', '\r' nor '\n'.
+
+    return starts[ ( first != 35 ) & ( first != 13 ) & ( first != 10 ) ]
+
+##  ========================================================================  ##
+
+def probe( file_name, exact=True ):
+    """
+    This function retrieves what is needed to plan a read of an ascii file
+    without reading the file.  The header is parsed up to the first line of
+    data and the rows are counted with count_rows().
+
+    Returns:
+        dtype       - dictionary
+            This is a numpy like dtype dictionary.
+        comments    - list
+            This is a 1-D list of the comments found before the body.
+        rows        - int
+            This is the number of rows of data, estimated if exact is False.
+    """
+
+    comments, dtype = parse_header( file_name )
+
+    return dtype, comments, count_rows( file_name, exact=exact )
+
+##  ========================================================================  ##
+
+def split_file( file_name, parts ):
+    """
+    This function splits a file into byte ranges which start and end on line
+    boundaries.  The returned offsets are increasing, with the first being 0
+    and the last being the size of the file.
+    """
+
+    size    = os.path.getsize( file_name )
+    offsets = [ 0 ]
+
+    with open( file_name, "rb" ) as in_file:
+
+        for k in range( 1, parts ):
+
+            ## Move to the start of the line following the split point.
+
+            in_file.seek( k * size // parts )
+            in_file.readline()
+
+            if offsets[-1] < in_file.tell() < size:
+                offsets.append( in_file.tell() )
+
+    offsets.append( size )
+
+    return offsets
+
+def parse_range(
+    file_name, start, stop, dtype, columns=None, where=None, block_size=2**24
+):
+    """
+    This function converts the lines of a file between the byte offsets start
+    and stop, which must lie on line boundaries, into a numpy record array with
+    parse_lines().  The range is read in blocks so that only one block of text
+    is held at a time.  If where is given, only the rows which satisfy it are
+    kept ( see selection.py ).
+
+    Returns:
+        array       - numpy record array
+        bad_lines   - int
+    """
+
+    chunks      = []
+    bad_lines   = 0
+    parsed      = io.read_columns( columns, where, np.dtype(dtype).names )
+
+    with open( file_name, "rb" ) as in_file:
+
+        in_file.seek( start )
+
+        for offset, block in iter_blocks( in_file, block_size, stop=stop ):
+
+            chunk, bad  = parse_lines(
+                block.decode().splitlines(), dtype, columns=parsed
+            )
+            bad_lines  += bad
+            chunks.append( io.apply_where( chunk, where, columns=columns ) )
+
+    if len( chunks ) == 0:
+        return parse_lines( [], dtype, columns=columns )
+
+    return np.concatenate( chunks ), bad_lines
+
+##  ========================================================================  ##
+
 def get_body( file_name ):
     """
     This function uses parse_file() to retrieve the body from a file.
@@ -110,10 +455,10 @@ def get_comments( file_name ):
 
 def get_dtype( file_name ):
     """
-    This function uses parse_file() to retrieve the dtype from a file.
+    This function uses parse_header() to retrieve the dtype from a file.
     """
 
-    return parse_file( file_name )[2]
+    return parse_header( file_name )[1]
 
 ##  ========================================================================  ##
 
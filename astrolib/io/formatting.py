@@ -6,7 +6,9 @@ from ._imports import *
 
 ##  ========================================================================  ##
 
-def get_dstring( dtype, space=3, sci=False, ipad=6, fpad=8.6, spad=32 ):
+def get_dstring(
+    dtype, space=3, sci=False, ipad=6, fpad=8.6, spad=32, widths=None
+):
     """
     This function creates and returns a format string for a single line of a
     numpy style dtype.  There is still a lot of work to do for this!  Currently
@@ -28,6 +30,9 @@ def get_dstring( dtype, space=3, sci=False, ipad=6, fpad=8.6, spad=32 ):
             format for floats
         spad        - int
             format for strings ( currently pretty lame )
+        widths      - dict
+            width of each column ( see get_widths() ); this replaces the
+            widths given by ipad, fpad and spad
     Returns:
         dstring     - string
             format string for one line of an array.
@@ -43,19 +48,20 @@ def get_dstring( dtype, space=3, sci=False, ipad=6, fpad=8.6, spad=32 ):
 
     for name in list( dtype.names ):
 
+        if widths is not None:
+            ipad    = spad  = widths[ name ]
+            fpad    = str( widths[ name ] ) + "." + get_precision( fpad )
+
         if 'U' in str( dtype[name] ):
 
-            #spad        = len(max( array[name], key=len ))
             dstring    += space * ' ' + '%-' + str(spad) + 's'
 
         elif 'S' in str( dtype[name] ):
 
-            #spad        = len(max( array[name], key=len ))
             dstring    += space * ' ' + '%-' + str(spad) + 's'
 
         elif 's' in str( dtype[name] ):
 
-            #spad        = len(max( array[name], key=len ))
             dstring    += space * ' ' + '%-' + str(spad) + 's'
 
         elif 'i' in str( dtype[name] ):
@@ -67,12 +73,104 @@ def get_dstring( dtype, space=3, sci=False, ipad=6, fpad=8.6, spad=32 ):
             if sci is False:
                 dstring    += space * ' ' + '%' + str(fpad) + 'f'
             elif sci is True:
-                dstring    += space * ' ' + '%' + str(fpad) + 'f'
+                dstring    += space * ' ' + '%' + str(fpad) + 'e'
 
     return dstring
 
 ##  ========================================================================  ##
 
+def get_widths( array, sci=False, fpad=8.6 ):
+    """
+    This function finds the width of each column of a numpy record array when
+    formatted by get_dstring(), so that the columns of a written file line up.
+    Only the extreme values of each numeric column are formatted, as these are
+    always the widest.
+
+    Parameters:
+        array       - ndarray
+            numpy record array
+        sci         - bool
+            hack to use scientific notation instead of flaots
+        fpad        - float
+            format for floats; only the precision is used
+    Returns:
+        widths      - dict
+            width of each column by column name
+    """
+
+    precision   = get_precision( fpad )
+    widths      = {}
+
+    for name in array.dtype.names:
+
+        column  = array[ name ]
+        kind    = array.dtype[ name ].kind
+        width   = 1
+
+        if column.size == 0:
+            pass
+
+        elif kind in "US":
+
+            width   = max( int(np.max( np.char.str_len(column) )), 1 )
+
+        elif kind in "iu":
+
+            width   = max( len( "%i" % np.min(column) ),
+                           len( "%i" % np.max(column) ) )
+
+        elif kind == "f":
+
+            finite  = column[ np.isfinite(column) ]
+
+            if finite.size < column.size:
+                width   = 4
+
+            if finite.size > 0:
+
+                extremes    = [ np.min(finite), np.max(finite) ]
+                fstring     = "%." + precision + "f"
+
+                ##  For scientific notation, the longest exponent belongs to
+                ##  the smallest non-zero magnitude or the largest magnitude.
+
+                if sci is True:
+                    fstring     = "%." + precision + "e"
+                    nonzero     = np.abs( finite[ finite != 0 ] )
+                    if nonzero.size > 0:
+                        extremes.append( -np.min( nonzero ) )
+
+                for value in extremes:
+                    width   = max( width, len( fstring % value ) )
+
+        widths[ name ]  = width
+
+    return widths
+
+def get_precision( fpad ):
+    """
+    Returns the precision, as a string, of a float format such as 8.6.
+    """
+
+    if "." in str( fpad ):
+        return str( fpad ).split( "." )[1]
+
+    return "6"
+
+##  ========================================================================  ##
+
+def sub_dtype( dtype, columns ):
+    """
+    This function returns a packed numpy dtype holding only the given columns of
+    a numpy dtype or dtype dictionary, in the order given.
+    """
+
+    dtype   = np.dtype( dtype )
+
+    return  np.dtype( [ (name, dtype[name]) for name in columns ] )
+
+##  ========================================================================  ##
+
 def tobool( val ):
     """
     Convert string object to boolean.
@@ -0,0 +1,102 @@
+"""
+This file contains functions for random access to the rows of an ascii file.
+build_index() stores the byte offset of every row of data in the cache ( see
+cache.py ) and read_rows() seeks to and converts only the requested rows.  The
+index is keyed like any cached array, so it is rebuilt automatically once the
+file changes.
+
+    rows    = io.read_rows( "master.cat", [125622, 125870, 138346, 70294] )
+"""
+
+from ._imports import *
+
+##  ========================================================================  ##
+
+def build_index( file_name, block_size=2**22 ):
+    """
+    This function finds the byte offset of every row of data in an ascii file
+    and stores them in the cache.  Row i of the index is row i of the array
+    returned by io.read().
+
+    Returns:
+        offsets         - numpy array
+            byte offsets of the rows, as uint32 when the file allows it
+    """
+
+    size    = os.path.getsize( file_name )
+    offsets = [ np.zeros( 0, dtype="int64" ) ]
+
+    with open( file_name, "rb" ) as in_file:
+
+        for start, block in io.iter_blocks( in_file, block_size ):
+            offsets.append( start + io.find_rows( block ) )
+
+    offsets = np.concatenate( offsets ).astype( np.min_scalar_type(size) )
+
+    ##  Store the index in the cache.
+
+    path    = io.cache_path( file_name, kind="index" )
+    os.makedirs( os.path.dirname(path), exist_ok=True )
+    np.save( path, offsets )
+    io.evict_cache( io.cache.cache_size )
+
+    return  offsets
+
+def get_index( file_name ):
+    """
+    This function returns the cached index of an ascii file, building it first
+    if the file has changed or has never been indexed.
+    """
+
+    path    = io.cache_path( file_name, kind="index" )
+
+    if os.path.isfile( path ):
+        os.utime( path )
+        return  np.load( path, mmap_mode="r" )
+
+    return  build_index( file_name )
+
+##  ========================================================================  ##
+
+def read_rows( file_name, rows, dtype=None, columns=None ):
+    """
+    This function reads only the requested rows of an ascii file by seeking to
+    them with the index of the file.
+
+    Parameters:
+        file_name       - str
+            name of ascii file
+        rows            - list, numpy array
+            row numbers to read, as in the array returned by io.read()
+        dtype           - dict
+            numpy dtype or numpy like dtype dictionary
+        columns         - list
+            names of the columns to read; if None, all columns are read
+
+    Returns:
+        array           - numpy record array of the rows in the order given
+    """
+
+    if dtype is None:
+        dtype   = io.parse_header( file_name )[1]
+
+    offsets         = get_index( file_name )[ np.asarray(rows, dtype="int64") ]
+
+    ##  Read each row once, in the order of the file.
+
+    unique, order   = np.unique( offsets, return_inverse=True )
+    lines           = []
+
+    with open( file_name, "rb" ) as in_file:
+
+        for offset in unique:
+
+            in_file.seek( int(offset) )
+            lines.append( in_file.readline().decode() )
+
+    array, bad_lines    = io.parse_lines( lines, dtype, columns=columns )
+
+    if bad_lines > 0:
+        print( "%i lines not read in %s." % (bad_lines, file_name) )
+
+    return  array[ order.ravel() ]
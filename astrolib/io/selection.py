@@ -0,0 +1,131 @@
+"""
+This file contains functions which select rows of a numpy record array by a
+condition on its columns.  A condition, called a where, may be given in either
+of two forms:
+
+    "(mag_r < 24) & (alpha > 149.5) & (alpha < 150.5)"
+
+        an expression of column names which is evaluated with numpy, so that
+        '&', '|' and '~' are used in place of 'and', 'or' and 'not'; numpy
+        functions are available as np, e.g. "np.isfinite(mag_r)"
+
+    [ ("mag_r", "<", 24), ("alpha", ">", 149.5), ("alpha", "<", 150.5) ]
+
+        a list of ( column, operator, value ) tuples which must all be true; a
+        list of such lists is true when any of its lists is true
+"""
+
+from ._imports import *
+
+import  operator
+
+##  ========================================================================  ##
+
+where_operators = {
+    "<":        operator.lt,
+    "<=":       operator.le,
+    ">":        operator.gt,
+    ">=":       operator.ge,
+    "==":       operator.eq,
+    "=":        operator.eq,
+    "!=":       operator.ne,
+    "in":       np.isin,
+    "not in":   lambda column, values: ~np.isin( column, values ),
+}
+
+##  ========================================================================  ##
+
+def select( array, where ):
+    """
+    Returns a boolean array which is True for the rows of a numpy record array
+    that satisfy the where condition.
+    """
+
+    ##  Evaluate an expression with the columns it names.
+
+    if isinstance( where, str ):
+
+        code    = compile( where, "<where>", "eval" )
+        columns = {
+            name: array[ name ] for name in code.co_names
+            if name in array.dtype.names
+        }
+
+        mask    = eval( code, { "__builtins__": {}, "np": np }, columns )
+
+        return  np.broadcast_to( np.asarray(mask, dtype=bool), array.shape )
+
+    ##  Combine ( column, operator, value ) tuples.
+
+    if len( where ) > 0 and isinstance( where[0], tuple ):
+        where   = [ where ]
+
+    mask    = np.zeros( array.shape, dtype=bool )
+
+    for conditions in where:
+
+        part    = np.ones( array.shape, dtype=bool )
+
+        for column, op, value in conditions:
+            part   &= where_operators[ op ]( array[column], value )
+
+        mask   |= part
+
+    return  mask
+
+def where_columns( where, names ):
+    """
+    Returns a list of the column names, out of the given names, which are used
+    by a where condition.
+    """
+
+    if isinstance( where, str ):
+
+        code    = compile( where, "<where>", "eval" )
+
+        return  [ name for name in names if name in code.co_names ]
+
+    if len( where ) > 0 and isinstance( where[0], tuple ):
+        where   = [ where ]
+
+    used    = [
+        condition[0] for conditions in where for condition in conditions
+    ]
+
+    return  [ name for name in names if name in used ]
+
+##  ========================================================================  ##
+
+def read_columns( columns, where, names ):
+    """
+    Returns the columns which must be read to apply a where condition and then
+    keep the requested columns, or None if all columns are requested.
+    """
+
+    if columns is None or where is None:
+        return  columns
+
+    return  list( columns ) + [
+        name for name in where_columns( where, names ) if name not in columns
+    ]
+
+def apply_where( array, where, columns=None ):
+    """
+    Returns the rows of a numpy record array which satisfy the where condition,
+    keeping only the requested columns.
+    """
+
+    if where is not None:
+        array   = array[ select( array, where ) ]
+
+    if columns is not None and list( columns ) != list( array.dtype.names ):
+
+        dtype   = io.sub_dtype( array.dtype, columns )
+        packed  = np.zeros( array.size, dtype=dtype )
+
+        for name in columns:
+            packed[ name ]  = array[ name ]
+
+        array   = packed
+
+    return  array
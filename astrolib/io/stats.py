@@ -0,0 +1,161 @@
+"""
+This file contains the block statistics of ascii catalogs.  When a catalog is
+written with io.write( ..., stats=True ), a sidecar file named like the catalog
+with '.stats' appended stores the byte range of every block of rows written and
+the minimum and maximum of each numeric column within the block.
+
+A read with a where of ( column, operator, value ) tuples then uses the sidecar
+to skip the blocks which cannot hold a matching row, so a box query on a
+catalog ordered by declination only parses the few blocks inside the box:
+
+    io.write( "master.cat", data, stats=True )
+
+    box     = io.read( "master.cat", where=[
+        ("delta", ">", 2.1), ("delta", "<", 2.3)
+    ])
+
+The sidecar is only used while the size and modification time of the catalog
+match those stored in it.
+"""
+
+from ._imports import *
+
+##  ========================================================================  ##
+
+def stats_path( file_name ):
+    """
+    Returns the path of the statistics sidecar of an ascii file.
+    """
+
+    return  file_name + ".stats"
+
+def block_stats( block ):
+    """
+    Returns the minimum and maximum of each numeric column of a block of rows
+    as two numpy records.  NaNs are ignored.
+    """
+
+    names   = [
+        name for name in block.dtype.names
+        if block.dtype[name].kind in "iuf"
+    ]
+    dtype   = io.sub_dtype( block.dtype, names )
+
+    minimum = np.zeros( min(block.size, 1), dtype=dtype )
+    maximum = np.zeros( min(block.size, 1), dtype=dtype )
+
+    if block.size == 0:
+        return  minimum, maximum
+
+    for name in names:
+        minimum[ name ] = np.fmin.reduce( block[name] )
+        maximum[ name ] = np.fmax.reduce( block[name] )
+
+    return  minimum, maximum
+
+##  ========================================================================  ##
+
+def write_stats( file_name, offsets, minimum, maximum ):
+    """
+    This function writes the statistics sidecar of an ascii file which has just
+    been written and closed.
+
+    Parameters:
+        file_name       - str
+            name of ascii file
+        offsets         - list
+            byte offsets of the blocks, with the end of the last block last
+        minimum         - numpy record array
+            minimum of each numeric column, one row per block
+        maximum         - numpy record array
+            maximum of each numeric column, one row per block
+    """
+
+    stat    = os.stat( file_name )
+
+    with open( stats_path(file_name), "wb" ) as out_file:
+
+        np.savez(
+            out_file,
+            offsets = np.asarray( offsets, dtype="int64" ),
+            minimum = minimum,
+            maximum = maximum,
+            stat    = np.array( [stat.st_size, stat.st_mtime_ns] ),
+        )
+
+def read_stats( file_name ):
+    """
+    This function returns the statistics sidecar of an ascii file as a
+    dictionary of offsets, minimum and maximum, or None if there is no sidecar
+    or the file has changed since it was written.
+    """
+
+    path    = stats_path( file_name )
+
+    if not os.path.isfile( path ):
+        return None
+
+    stat    = os.stat( file_name )
+
+    with np.load( path ) as sidecar:
+
+        if list( sidecar["stat"] ) != [ stat.st_size, stat.st_mtime_ns ]:
+            return None
+
+        return  {
+            "offsets":  sidecar["offsets"],
+            "minimum":  sidecar["minimum"],
+            "maximum":  sidecar["maximum"],
+        }
+
+##  ========================================================================  ##
+
+def find_blocks( stats, where ):
+    """
+    Returns the byte ranges, as a list of ( start, stop ) tuples, of the blocks
+    which may hold rows satisfying a where of ( column, operator, value )
+    tuples.  Conditions on columns without statistics never skip a block.
+    """
+
+    if len( where ) > 0 and isinstance( where[0], tuple ):
+        where   = [ where ]
+
+    minimum = stats["minimum"]
+    maximum = stats["maximum"]
+    keep    = np.zeros( minimum.size, dtype=bool )
+
+    for conditions in where:
+
+        part    = np.ones( minimum.size, dtype=bool )
+
+        for column, op, value in conditions:
+
+            if column not in minimum.dtype.names:
+                continue
+
+            low, high   = minimum[ column ], maximum[ column ]
+
+            if op == "<":
+                part   &= low < value
+            elif op == "<=":
+                part   &= low <= value
+            elif op == ">":
+                part   &= high > value
+            elif op == ">=":
+                part   &= high >= value
+            elif op in [ "==", "=" ]:
+                part   &= ( low <= value ) & ( high >= value )
+            elif op == "in":
+                values  = np.asarray( value )
+                part   &= np.any(
+                    ( low[:,None] <= values ) & ( high[:,None] >= values ),
+                    axis=1
+                )
+
+        keep   |= part
+
+    offsets = stats["offsets"]
+
+    return  [
+        ( int(offsets[i]), int(offsets[i+1]) ) for i in np.flatnonzero( keep )
+    ]
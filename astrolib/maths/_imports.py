@@ -17,6 +17,8 @@ import  pickle
 import  gzip
 import  pyarrow
 import  collections
+import  itertools
+import  concurrent.futures
 import  warnings
 warnings.filterwarnings("ignore")
 
@@ -1,4 +1,9 @@
 
 from    .master         import master
 from    .create         import create
-from    .correlation    import correlate, clean_duplicates, combine
+from    .correlation    import correlate, correlate_chunked, \
+                                correlate_parallel, \
+                                clean_duplicates, assign_greedy, \
+                                match_table, pairs_table, multiplicity, \
+                                nearest_matches, combine
+from    .engines        import nearest_engines, pair_engines
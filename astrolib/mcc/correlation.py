@@ -4,19 +4,41 @@ The module contains correlation functions and routines.
 
 from ._imports import *
 
+import  multiprocessing.shared_memory
+import  scipy.spatial
+
+##  ============================================================================
+
+match_table     = collections.namedtuple(
+    "match_table", [ "offsets", "indices", "separations" ]
+)
+
 ##  ============================================================================
 
-def correlate( Ax, Ay, Bx, By, Rc, Rc_min=None, Rc_unit="arcsecs" ):
+def correlate(
+    Ax, Ay, Bx, By, Rc, Rc_min=None, Rc_unit="arcsecs", engine="tree",
+    assign="nearest", mode="nearest"
+):
     """
     This function correlates objects from positions B to positions A using the
-    correlation radius Rc.
+    correlation radius Rc.  The nearest neighbors are found with the given
+    engine ( see engines.py ): "tree" by default, "brute" for the original
+    comparison of every pair, or "zone" for a sweep over declination zones
+    which measures true angular separations.
+
+    With assign="nearest" each position a is matched to its nearest position
+    b, and where several positions a share a position b only the nearest of
+    them keeps it.  With assign="greedy" the pairs within Rc are matched one
+    to one in order of separation, so that a position a which loses its
+    nearest position b is matched to its next nearest instead.
+
+    With mode="all" every pair within Rc is kept, and a match_table of flat
+    arrays is returned in place of M, S, Pa and Nb: the positions b of
+    position a i are indices[ offsets[i]:offsets[i+1] ], in order of their
+    separations[ offsets[i]:offsets[i+1] ].  See multiplicity() and
+    nearest_matches().
     """
 
-    ##  Convert Rc units to degrees.
-
-    if Rc_unit in ["arcsecond","arcseconds","arcsec","arcsecs","as"]:
-        Rc /= 3600
-
     ##  Ensure that position arguments are numpy arrays with agreeable lengths.
     ##  Ensure that Rc argument becomes a numpy array.
 
@@ -29,56 +51,343 @@ def correlate( Ax, Ay, Bx, By, Rc, Rc_min=None, Rc_unit="arcsecs" ):
     if Bx.size != By.size:
         raise TypeError("Bx and By must be of the same length.")
 
-    if isinstance( Rc, (float, int) ):
+    Rc      = correlation_radii( Rc, Ax.size, Rc_min, Rc_unit )
+
+    ##  Find a nearest neighbor in positons b for every position a and keep as a
+    ##  match if its separation is within the correlation radius.
+
+    if engine not in mcc.nearest_engines:
+        raise ValueError(
+            "engine must be one of: " + ", ".join( mcc.nearest_engines )
+        )
+
+    if assign not in [ "nearest", "greedy" ]:
+        raise ValueError( "assign must be one of: nearest, greedy" )
+
+    if mode not in [ "nearest", "all" ]:
+        raise ValueError( "mode must be one of: nearest, all" )
+
+    if mode == "all":
+
+        pairs   = mcc.pair_engines[ engine ]( Ax, Ay, Bx, By, Rc )
+
+        return  pairs_table( *pairs, size=Ax.size )
+
+    if assign == "greedy":
 
-        rc  = np.copy( Rc )
-        Rc  = np.zeros( Ax.size )
-        Rc.fill( rc )
+        pairs   = mcc.pair_engines[ engine ]( Ax, Ay, Bx, By, Rc )
+        M, S    = assign_greedy( *pairs, size=Ax.size )
 
     else:
 
-        try:
-            Rc      = np.array( Rc )
-        except:
-            raise TypeError("Rc must be of type 'float', 'int', or 'array'.")
+        M, S    = mcc.nearest_engines[ engine ]( Ax, Ay, Bx, By, Rc )
 
-        if Rc.size != Ax.size:
-            raise TypeError(
-                "If Rc is an array, it must be the same size as Ax."
-            )
+        far     = np.where( S > Rc )[0]
+        M[far]  = -99
+        S[far]  = -99
+
+        M, S    = clean_duplicates( M, S )
+
+    ##  Return array of matches and separations.
+    ##  Return indices of the positively correlated in M.
+    ##  Return indices of the negatively correlated in positions b.
+
+    Pa      = np.where( M >= 0 )[0]
+    Nb      = np.delete( np.arange(Bx.size), M[Pa] )
+
+    return  M, S, Pa, Nb
+
+def correlation_radii( Rc, size, Rc_min=None, Rc_unit="arcsecs" ):
+    """
+    Returns the correlation radius of each of size positions a in degrees as
+    a new array, so the radii given are not changed.
+    """
+
+    try:
+        Rc  = np.array( Rc, dtype="float64" )
+    except:
+        raise TypeError("Rc must be of type 'float', 'int', or 'array'.")
+
+    if Rc.ndim == 0:
+        Rc  = np.full( size, Rc )
+
+    if Rc.size != size:
+        raise TypeError(
+            "If Rc is an array, it must be the same size as Ax."
+        )
 
     if Rc_min is not None:
         Rc[ np.where( Rc < Rc_min )[0] ]    = Rc_min
 
-    ##  Create arrays to store matching indices from positions b onto a and an
-    ##  array to store their separations.
+    ##  Convert Rc units to degrees.
+
+    if Rc_unit in ["arcsecond","arcseconds","arcsec","arcsecs","as"]:
+        Rc /= 3600
+
+    return  Rc
+
+##  ============================================================================
+
+def correlate_chunked(
+    Ax, Ay, B, Rc, Rc_min=None, Rc_unit="arcsecs", engine="tree",
+    x_col="alpha", y_col="delta", chunk_rows=2**20, return_unmatched=False
+):
+    """
+    This function correlates objects from positions B to positions A as
+    correlate() does with assign="nearest", but reads positions B a chunk at a
+    time, so that catalogs B larger than memory may be matched.  Only
+    positions a, one chunk of positions b and the best match of each position
+    a so far are held in memory.  With engine="tree" the k-d tree of positions
+    a is built once and each chunk is matched against it.
+
+        M, S, Pa, Nb    = mcc.correlate_chunked(
+            master["alpha"], master["delta"], "survey.cat", 1.0
+        )
+
+    Positions b which were not matched are usually nearly all of B, so Nb is
+    only found if return_unmatched is True, and is None otherwise.
+
+    Parameters:
+        Ax, Ay          - numpy.ndarray
+            positions a
+        B               - str, numpy.ndarray, tuple, iterable
+            positions b as the name of a file read with io.iter_read(), a
+            record array or numpy.memmap with columns x_col and y_col, a tuple
+            of arrays ( Bx, By ), or an iterable of such records or tuples
+        Rc              - float, numpy.ndarray
+            correlation radius or radii of positions a
+        chunk_rows      - int
+            number of positions b per chunk
+        return_unmatched    - bool
+            to return the indices of the positions b which were not matched
+
+    Returns:
+        M, S, Pa, Nb    - as returned by correlate(), with M indexing the rows
+                          of positions b in the order they were read
+    """
+
+    Ax, Ay      = np.array( Ax ), np.array( Ay )
+
+    if Ax.size != Ay.size:
+        raise TypeError("Ax and Ay must be of the same length.")
+
+    if engine not in mcc.pair_engines:
+        raise ValueError(
+            "engine must be one of: " + ", ".join( mcc.pair_engines )
+        )
+
+    Rc      = correlation_radii( Rc, Ax.size, Rc_min, Rc_unit )
+    options = {}
+
+    if engine == "tree" and Ax.size > 0:
+        options["a_tree"]   = scipy.spatial.cKDTree( np.column_stack(
+            (Ax, Ay)
+        ))
+
+    ##  Keep the nearest position b of each position a over all chunks.  A
+    ##  later chunk replaces a match only if it is strictly nearer, so ties go
+    ##  to the lower index as in brute().
 
     M, S    = np.zeros(
         Ax.size, dtype='int64' ), np.zeros( Ax.size, dtype='float64'
     )
     M.fill( -99 )
-    S.fill( -99 )
+    S.fill( np.inf )
 
-    ##  Find a nearest neighbor in positons b for every position a and keep as a
-    ##  match if its separation is within the correlation radius.
+    first   = 0
 
-    for i in range( Ax.size ):
+    for Bx, By in position_chunks( B, x_col, y_col, chunk_rows ):
 
-        io.progress( i, Ax.size, alert="Correlating..." )
+        Bx, By  = np.asarray( Bx, dtype="float64" ), \
+                  np.asarray( By, dtype="float64" )
 
-        Sj      = np.sqrt( (Bx - Ax[i])**2 + (By - Ay[i])**2 )
-        M[i]    = np.where( Sj == np.min(Sj) )[0][0]
-        S[i]    = Sj[ M[i] ]
+        pairs_a, pairs_b, sep   = mcc.pair_engines[ engine ](
+            Ax, Ay, Bx, By, Rc, **options
+        )
 
-    ##  Take the square root of the separations squared.
+        nearest = np.lexsort( (pairs_b, sep, pairs_a) )
+        pairs_a = pairs_a[ nearest ]
+        keep    = np.ones( pairs_a.size, dtype=bool )
+        keep[1:]= pairs_a[1:] != pairs_a[:-1]
 
-    far     = np.where( S > Rc )[0]
-    M[far]  = -99
-    S[far]  = -99
+        pairs_a = pairs_a[ keep ]
+        pairs_b = pairs_b[ nearest ][ keep ] + first
+        sep     = sep[ nearest ][ keep ]
 
-    ##  Return array of matches and separations.
-    ##  Return indices of the positively correlated in M.
-    ##  Return indices of the negatively correlated in positions b.
+        better  = sep < S[ pairs_a ]
+
+        M[ pairs_a[better] ]    = pairs_b[ better ]
+        S[ pairs_a[better] ]    = sep[ better ]
+
+        first  += Bx.size
+
+    S[ M < 0 ]  = -99
+
+    ##  Resolve the duplicates over all chunks at once.
+
+    M, S    = clean_duplicates( M, S )
+    Pa      = np.where( M >= 0 )[0]
+    Nb      = None
+
+    if return_unmatched is True:
+
+        unmatched           = np.ones( first, dtype=bool )
+        unmatched[ M[Pa] ]  = False
+        Nb                  = np.where( unmatched )[0]
+
+    return  M, S, Pa, Nb
+
+def position_chunks( B, x_col="alpha", y_col="delta", chunk_rows=2**20 ):
+    """
+    This generator yields the positions b of B ( see correlate_chunked() ) as
+    arrays ( Bx, By ) of at most chunk_rows rows, or of one given chunk.
+    """
+
+    if isinstance( B, str ):
+
+        for chunk in io.iter_read(
+            B, chunk_rows=chunk_rows, columns=[ x_col, y_col ]
+        ):
+            yield   chunk[ x_col ], chunk[ y_col ]
+
+    elif isinstance( B, np.ndarray ) or isinstance( B, tuple ):
+
+        if isinstance( B, tuple ):
+            Bx, By  = B
+        else:
+            Bx, By  = B[ x_col ], B[ y_col ]
+
+        for first in range( 0, len( Bx ), chunk_rows ):
+            yield   Bx[ first:first+chunk_rows ], By[ first:first+chunk_rows ]
+
+    else:
+
+        for chunk in B:
+
+            if isinstance( chunk, tuple ):
+                yield   chunk
+            else:
+                yield   chunk[ x_col ], chunk[ y_col ]
+
+##  ============================================================================
+
+def correlate_parallel(
+    Ax, Ay, Bx, By, Rc, Rc_min=None, Rc_unit="arcsecs", engine="tree",
+    workers=None, tiles=None
+):
+    """
+    This function correlates objects from positions B to positions A as
+    correlate() does with assign="nearest", with the work split over a pool of
+    processes.  Positions a are divided into a grid of tiles in alpha and
+    delta, and each tile is matched in a worker against the positions b
+    within the tile padded by the largest radius of its positions a, so that
+    the nearest neighbor of every position a is found as in the serial path.
+    The positions are shared with the workers through shared memory rather
+    than pickled.  The duplicates are then resolved over all tiles at once,
+    so the results are those of correlate().
+
+    Parameters:
+        workers         - int
+            number of processes; by default the number of CPUs
+        tiles           - tuple
+            number of tiles ( in alpha, in delta ); by default about four
+            tiles per worker
+    """
+
+    Ax, Ay      = np.array( Ax, dtype="float64" ), \
+                  np.array( Ay, dtype="float64" )
+    Bx, By      = np.array( Bx, dtype="float64" ), \
+                  np.array( By, dtype="float64" )
+
+    if Ax.size != Ay.size:
+        raise TypeError("Ax and Ay must be of the same length.")
+
+    if Bx.size != By.size:
+        raise TypeError("Bx and By must be of the same length.")
+
+    if engine not in mcc.nearest_engines:
+        raise ValueError(
+            "engine must be one of: " + ", ".join( mcc.nearest_engines )
+        )
+
+    Rc      = correlation_radii( Rc, Ax.size, Rc_min, Rc_unit )
+
+    if workers is None:
+        workers = os.cpu_count()
+
+    if workers <= 1 or Ax.size == 0 or Bx.size == 0:
+        return  correlate(
+            Ax, Ay, Bx, By, Rc, Rc_unit="degrees", engine=engine
+        )
+
+    if tiles is None:
+        ny      = int( np.ceil( np.sqrt(4 * workers) ) )
+        tiles   = ( int( np.ceil(4 * workers / ny) ), ny )
+
+    ##  Sort positions a by tile so that each tile is a slice of them.
+
+    nx, ny  = tiles
+    x_low, x_high   = Ax.min(), Ax.max()
+    y_low, y_high   = Ay.min(), Ay.max()
+
+    ix      = np.floor( (Ax - x_low) * (nx / max(x_high - x_low, 1e-300)) )
+    iy      = np.floor( (Ay - y_low) * (ny / max(y_high - y_low, 1e-300)) )
+    tile    = np.clip( iy, 0, ny-1 ).astype( "int64" ) * nx + \
+              np.clip( ix, 0, nx-1 ).astype( "int64" )
+
+    order   = np.argsort( tile, kind="stable" )
+    bounds  = np.searchsorted( tile[order], np.arange( nx*ny + 1 ) )
+
+    ##  Copy the positions into shared memory as one array of
+    ##  [ Ax, Ay, Rc, Bx, By ], with positions a in tile order.
+
+    sizes   = ( Ax.size, Bx.size )
+    block   = multiprocessing.shared_memory.SharedMemory(
+        create=True, size=8 * ( 3*Ax.size + 2*Bx.size )
+    )
+
+    try:
+
+        shared  = np.ndarray(
+            3*Ax.size + 2*Bx.size, dtype="float64", buffer=block.buf
+        )
+        shared[:]   = np.concatenate(
+            (Ax[order], Ay[order], Rc[order], Bx, By)
+        )
+        del shared
+
+        tasks   = [
+            ( start, stop ) for start, stop in zip( bounds[:-1], bounds[1:] )
+            if stop > start
+        ]
+
+        with concurrent.futures.ProcessPoolExecutor( workers ) as pool:
+
+            results = pool.map(
+                correlate_tile,
+                itertools.repeat( block.name ), itertools.repeat( sizes ),
+                itertools.repeat( engine ),
+                [ start for start, stop in tasks ],
+                [ stop for start, stop in tasks ]
+            )
+
+            ##  Each position a is in a single tile, which found its nearest
+            ##  neighbor.
+
+            M, S    = np.zeros(
+                Ax.size, dtype='int64' ), np.zeros( Ax.size, dtype='float64'
+            )
+
+            for start, M_tile, S_tile in results:
+                M[ order[start:start+M_tile.size] ] = M_tile
+                S[ order[start:start+M_tile.size] ] = S_tile
+
+    finally:
+
+        block.close()
+        block.unlink()
+
+    ##  Resolve the duplicates over all tiles at once.
 
     M, S    = clean_duplicates( M, S )
     Pa      = np.where( M >= 0 )[0]
@@ -86,39 +395,217 @@ def correlate( Ax, Ay, Bx, By, Rc, Rc_min=None, Rc_unit="arcsecs" ):
 
     return  M, S, Pa, Nb
 
+def correlate_tile( name, sizes, engine, start, stop ):
+    """
+    Matches the positions a of the slice [ start, stop ) of a tile, in the
+    shared memory block name made by correlate_parallel(), against the
+    positions b within its padded bounds.  Returns start and the matches and
+    separations of the slice, with matches indexing all positions b.
+    """
+
+    Na, Nb  = sizes
+    block   = multiprocessing.shared_memory.SharedMemory( name=name )
+
+    try:
+
+        shared  = np.ndarray( 3*Na + 2*Nb, dtype="float64", buffer=block.buf )
+
+        Ax      = shared[ start:stop ].copy()
+        Ay      = shared[ Na+start:Na+stop ].copy()
+        Rc      = shared[ 2*Na+start:2*Na+stop ].copy()
+        Bx      = shared[ 3*Na:3*Na+Nb ]
+        By      = shared[ 3*Na+Nb: ]
+
+        ##  Pad the bounds of the tile by its largest radius, widened in alpha
+        ##  by 1/cos( delta ) and wrapped at 360 degrees for the zone engine.
+
+        pad     = np.max( Rc )
+        near    = ( By >= Ay.min() - pad ) & ( By <= Ay.max() + pad )
+
+        if engine == "zone":
+
+            delta   = min( max( abs(Ay.min()), abs(Ay.max()) ) + pad, 90 )
+            pad_x   = pad / max( np.cos( np.radians(delta) ), 1e-12 )
+            width   = Ax.max() - Ax.min() + 2 * pad_x
+
+            if width < 360:
+                near   &= np.mod( Bx - (Ax.min() - pad_x), 360 ) <= width
+
+        else:
+
+            near   &= ( Bx >= Ax.min() - pad ) & ( Bx <= Ax.max() + pad )
+
+        ##  Query the tree in a single thread, as the tiles are already
+        ##  spread over the processes.
+
+        options = { "workers": 1 } if engine == "tree" else {}
+        near    = np.where( near )[0]
+        M, S    = mcc.nearest_engines[ engine ](
+            Ax, Ay, Bx[near].copy(), By[near].copy(), Rc, **options
+        )
+
+        del shared, Bx, By
+
+    finally:
+
+        block.close()
+
+    ##  Keep the matches within the radius and index them into positions b.
+
+    far     = S > Rc
+    M[far]  = -99
+    S[far]  = -99
+    M[M>=0] = near[ M[M>=0] ]
+
+    return  start, M, S
+
 ##  ============================================================================
 
 def clean_duplicates( M, S ):
     """
     This function removes duplicate objects from the matches and separations
     arrays.  Of any repeat objects, the one of the smallest separation is the
-    one kept while all others are set to -99.
+    one kept while all others are set to -99.  Objects tied at the smallest
+    separation are all kept.
+    """
+
+    ##  Sort the matches by object and then separation, so that the repeats of
+    ##  an object form a run which starts with its smallest separation.
+
+    matched = np.where( M >= 0 )[0]
+    matched = matched[ np.lexsort( (S[matched], M[matched]) ) ]
+
+    if matched.size == 0:
+        return M, S
+
+    first       = np.ones( matched.size, dtype=bool )
+    first[1:]   = M[ matched[1:] ] != M[ matched[:-1] ]
+
+    ##  Keep only the smaller of the separations.
+
+    nearest = S[ matched[first] ][ np.cumsum( first ) - 1 ]
+    far     = matched[ S[matched] > nearest ]
+
+    M[far]  = -99
+    S[far]  = -99
+
+    return M, S
+
+def assign_greedy( pairs_a, pairs_b, sep, size ):
+    """
+    This function matches the pairs of positions a and b one to one in order
+    of separation: the closest pair is matched, every other pair of its
+    positions a and b is dropped, and so on.  It returns the matches and
+    separations of the size positions a, with -99 where there is no match.
+
+    The pairs are sorted once and then scanned once, so this is O(N log N)
+    in the number of pairs.  Most pairs are decided before the scan, as a
+    pair which is the closest pair of both its position a and its position b
+    is always matched and any other pair of either position never is.
     """
 
-    ## Find duplicated correlated objects.
-    ## Keep only the smaller of the separations.
+    M, S    = np.zeros( size, dtype='int64' ), np.zeros( size, dtype='float64' )
+    M.fill( -99 )
+    S.fill( -99 )
+
+    ##  Order the pairs by separation, breaking ties by index.
+
+    order   = np.lexsort( (pairs_b, pairs_a, sep) )
+    pairs_a = np.asarray( pairs_a, dtype="int64" )[ order ]
+    pairs_b = np.asarray( pairs_b, dtype="int64" )[ order ]
+    sep     = np.asarray( sep, dtype="float64" )[ order ]
+
+    if pairs_a.size == 0:
+        return M, S
+
+    taken_b = np.zeros( pairs_b.max() + 1, dtype=bool )
 
-    for i in range( M.size ):
+    ##  Match the pairs which come first for both of their positions.
 
-        io.progress( i, M.size, alert='Cleaning...' )
+    best_a  = np.zeros( pairs_a.size, dtype=bool )
+    best_b  = np.zeros( pairs_b.size, dtype=bool )
 
-        if M[i] >= 0:
+    best_a[ np.unique( pairs_a, return_index=True )[1] ]    = True
+    best_b[ np.unique( pairs_b, return_index=True )[1] ]    = True
 
-            others  = np.where( M == M[i] )[0]
+    take    = best_a & best_b
 
-            if others.size > 1:
+    M[ pairs_a[take] ]      = pairs_b[ take ]
+    S[ pairs_a[take] ]      = sep[ take ]
+    taken_b[ pairs_b[take] ]= True
 
-                far = others[
-                    np.where( S[others] > np.min(S[others]) )[0]
-                ]
+    keep    = ( M[pairs_a] < 0 ) & ~taken_b[ pairs_b ]
 
-                M[far]  = -99
-                S[far]  = -99
+    ##  Scan the rest in order, matching each pair whose positions are both
+    ##  still free.
+
+    for k, a, b in zip(
+        np.where( keep )[0].tolist(), pairs_a[ keep ].tolist(),
+        pairs_b[ keep ].tolist()
+    ):
+
+        if M[a] < 0 and not taken_b[b]:
+            M[a]        = b
+            S[a]        = sep[k]
+            taken_b[b]  = True
 
     return M, S
 
 ##  ============================================================================
 
+def pairs_table( pairs_a, pairs_b, sep, size ):
+    """
+    Returns the pairs of positions a and b as a match_table of the size
+    positions a, with the positions b of each position a in order of
+    separation and then index.
+    """
+
+    order   = np.lexsort( (pairs_b, sep, pairs_a) )
+    counts  = np.bincount( pairs_a, minlength=size )
+    offsets = np.zeros( size + 1, dtype="int64" )
+
+    np.cumsum( counts, out=offsets[1:] )
+
+    return  match_table(
+        offsets, np.asarray( pairs_b, dtype="int64" )[ order ],
+        np.asarray( sep, dtype="float64" )[ order ]
+    )
+
+def multiplicity( table, size=None ):
+    """
+    Returns the number of positions b within Rc of each position a of a
+    match_table.  If size is given, also returns the number of positions a
+    within whose radius each of size positions b lies.
+    """
+
+    counts  = np.diff( table.offsets )
+
+    if size is None:
+        return  counts
+
+    return  counts, np.bincount( table.indices, minlength=size )
+
+def nearest_matches( table ):
+    """
+    Returns the matches and separations of the nearest position b of each
+    position a of a match_table, with -99 where there is none, as the engines
+    do; pass them to clean_duplicates() to remove repeat objects.
+    """
+
+    size    = table.offsets.size - 1
+    found   = np.where( np.diff( table.offsets ) > 0 )[0]
+
+    M, S    = np.zeros( size, dtype='int64' ), np.zeros( size, dtype='float64' )
+    M.fill( -99 )
+    S.fill( -99 )
+
+    M[ found ]  = table.indices[ table.offsets[found] ]
+    S[ found ]  = table.separations[ table.offsets[found] ]
+
+    return  M, S
+
+##  ============================================================================
+
 def combine( catalogs, Rc, x_col="alpha", y_col="delta" ):
     """
     This function takes as input a list of catalogs and combine them into a
@@ -7,69 +7,76 @@ from ._imports import *
 
 ##  ============================================================================
 
-def create( fits_file, configs_file, path="." ):
+def create( fits_file, configs_file, path=".", workers=None ):
 
     timer   = io.timer("mcc  -  master catalog correlation")
     timer.start("mcc")
 
-    ##  Read in the configuration files.
-    ##  Set file path variables.
+    with io.profile.span( "mcc.create" ):
 
-    configs = io.read( configs_file )
+        ##  Read in the configuration files.
+        ##  Set file path variables.
 
-    ##  Initialize the master catalog object.
+        configs = io.read( configs_file )
 
-    if os.path.isfile( fits_file ):
-        FM  = mcc.master( fits_file, init=False )
+        ##  Initialize the master catalog object.
 
-    else:
-        FM  = mcc.master( fits_file, init=True )
+        if os.path.isfile( fits_file ):
+            FM  = mcc.master( fits_file, init=False )
 
-    ## Loop through all catalog configurations and add them to the Cube.
+        else:
+            FM  = mcc.master( fits_file, init=True )
 
-    for i in range( len(configs) ):
+        ## Loop through all catalog configurations and add them to the Cube.
 
-        ##  Retrieve configurations.
-        ##  Retrieve image configurations specific to the input catalog.
-        ##  Read in the input catalog.
+        for i in range( len(configs) ):
 
-        name        = configs[i]["name"]
-        cat_file    = os.path.join( path, configs[i]["catalog"] )
-        Rc          = configs[i]["Rc"]
-        append      = configs[i]["append"]
+            ##  Retrieve configurations.
+            ##  Retrieve image configurations specific to the input catalog.
+            ##  Read in the input catalog.
 
-        if append.lower() == "true":
-            append  = True
-        else:
-            append  = False
+            name        = configs[i]["name"]
+            cat_file    = os.path.join( path, configs[i]["catalog"] )
+            Rc          = configs[i]["Rc"]
+            append      = configs[i]["append"]
 
-        ##  This is  currently not needed now that image_managers are use.
-        ##  Add images to the header.
-        # images      = []
-        # for j in range( len(configs) ):
-        #     if configs[j]["name"] == configs[i]["name"]:
-        #         images.append( configs[j]["image"] )
+            if append.lower() == "true":
+                append  = True
+            else:
+                append  = False
 
-        ##   Make sure the catalog is not already added.
+            ##  This is  currently not needed now that image_managers are use.
+            ##  Add images to the header.
+            # images      = []
+            # for j in range( len(configs) ):
+            #     if configs[j]["name"] == configs[i]["name"]:
+            #         images.append( configs[j]["image"] )
 
-        if name in FM.catalogs:
-            continue
+            ##   Make sure the catalog is not already added.
 
-        ##  Correlate and add catalog to the Master Catalog.
+            if name in FM.catalogs:
+                continue
 
-        timer.start(
-            "correlation",
-            alert="\nAdding %s to the Master Catalog..." % name
-        )
+            ##  Correlate and add catalog to the Master Catalog.
+
+            timer.start(
+                "correlation",
+                alert="\nAdding %s to the Master Catalog..." % name
+            )
 
-        catalog = io.read( cat_file )
-        FM.correlate( name, catalog, Rc, append=append )
-        FM.save( FM.fits_file, overwrite=True )
+            with io.profile.span( "read" ):
+                catalog = io.read( cat_file )
 
-        timer.end("correlation")
+            FM.correlate( name, catalog, Rc, append=append, workers=workers )
 
-    print(
-        "\nThe Master Catalog '%s' has been successfully created." % fits_file
-    )
+            with io.profile.span( "save" ):
+                FM.save( FM.fits_file, overwrite=True )
+
+            timer.end("correlation")
+
+        print(
+            "\nThe Master Catalog '%s' has been successfully created." %
+            fits_file
+        )
 
-    timer.end("mcc")
+        timer.end("mcc")
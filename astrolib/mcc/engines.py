@@ -0,0 +1,341 @@
+"""
+This module contains the nearest neighbor engines used by mcc.correlate().  Each
+engine finds, for every position a, the nearest position b within the largest
+correlation radius and returns the arrays
+
+    M   - index into positions b of the nearest neighbor, or -99 if none
+    S   - separation of the nearest neighbor, or -99 if none
+
+in the same units as the positions.  correlate() then applies the radius of
+each object and removes duplicates.  Each engine also has a pair engine which
+returns every pair of positions a and b within the radius of position a as
+
+    pairs_a, pairs_b, separations
+
+    brute   - compares each position a to every position b; O(N*M), kept as a
+              reference for testing the others
+    tree    - queries a k-d tree of positions b; O((N+M) log M)
+    zone    - sorts positions b into declination zones by right ascension and
+              searches only the neighboring zones; separations are the true
+              angular separations of ( alpha, delta ) positions in degrees
+"""
+
+from ._imports import *
+
+import  scipy.spatial
+
+##  ============================================================================
+
+def brute( Ax, Ay, Bx, By, Rc ):
+    """
+    Finds the nearest neighbor of each position a by computing its separation
+    from every position b.
+    """
+
+    M, S    = np.zeros(
+        Ax.size, dtype='int64' ), np.zeros( Ax.size, dtype='float64'
+    )
+    M.fill( -99 )
+    S.fill( -99 )
+
+    if Bx.size == 0:
+        return  M, S
+
+    for i in io.progress_bar( Ax.size, alert="Correlating..." ):
+
+        Sj      = np.sqrt( (Bx - Ax[i])**2 + (By - Ay[i])**2 )
+        M[i]    = np.where( Sj == np.min(Sj) )[0][0]
+        S[i]    = Sj[ M[i] ]
+
+    return  M, S
+
+def tree( Ax, Ay, Bx, By, Rc, workers=-1 ):
+    """
+    Finds the nearest neighbor of each position a within the largest radius of
+    Rc by querying a k-d tree built on positions b, with workers threads ( -1
+    for one per CPU ).
+    """
+
+    M, S    = np.zeros(
+        Ax.size, dtype='int64' ), np.zeros( Ax.size, dtype='float64'
+    )
+    M.fill( -99 )
+    S.fill( -99 )
+
+    if Ax.size == 0 or Bx.size == 0:
+        return  M, S
+
+    b_tree  = scipy.spatial.cKDTree( np.column_stack( (Bx, By) ) )
+
+    Sj, Mj  = b_tree.query(
+        np.column_stack( (Ax, Ay) ), k=1,
+        distance_upper_bound=np.max( Rc ), workers=workers
+    )
+
+    ##  Positions with no neighbor within the radius are given an infinite
+    ##  separation and an index of Bx.size.
+
+    near        = np.isfinite( Sj )
+    M[ near ]   = Mj[ near ]
+    S[ near ]   = Sj[ near ]
+
+    return  M, S
+
+def zone( Ax, Ay, Bx, By, Rc, block_size=2**20 ):
+    """
+    Finds the nearest neighbor of each position a within its radius Rc by a
+    sort and sweep over declination zones ( see zone_blocks() ).
+    """
+
+    M, S    = np.zeros(
+        Ax.size, dtype='int64' ), np.zeros( Ax.size, dtype='float64'
+    )
+    M.fill( -99 )
+    S.fill( -99 )
+
+    for pairs_a, pairs_b, sep in zone_blocks(
+        Ax, Ay, Bx, By, Rc, block_size=block_size
+    ):
+
+        ##  Keep the nearest pair of each position a, breaking ties by the
+        ##  lower index b as brute() does.
+
+        nearest = np.lexsort( (pairs_b, sep, pairs_a) )
+        pairs_a = pairs_a[ nearest ]
+        keep    = np.ones( pairs_a.size, dtype=bool )
+        keep[1:]= pairs_a[1:] != pairs_a[:-1]
+
+        M[ pairs_a[keep] ]  = pairs_b[ nearest ][ keep ]
+        S[ pairs_a[keep] ]  = sep[ nearest ][ keep ]
+
+    return  M, S
+
+def zone_blocks( Ax, Ay, Bx, By, Rc, block_size=2**20 ):
+    """
+    This generator yields the pairs of positions a and b within the radius Rc
+    of each position a as arrays of ( pairs_a, pairs_b, separations ), for
+    one block of block_size positions a at a time.  Positions are ( alpha,
+    delta ) in degrees.  The zones are as tall as the largest radius, so the
+    neighbors of a position a lie in its own zone or the zones above and below
+    it, and within each zone they lie in a window of alpha widened by 1/cos(
+    delta ) and wrapped at 0 and 360 degrees.
+    """
+
+    if Ax.size == 0 or Bx.size == 0:
+        return
+
+    radius  = max( float( np.max(Rc) ), 1e-12 )
+
+    ##  Sort positions b by zone and then alpha.  The two are kept apart, as
+    ##  a single key of zone * 360 + alpha loses the precision of alpha once
+    ##  there are many zones.
+
+    B_zone  = np.floor( (By + 90) / radius ).astype( "int64" )
+    B_alpha = np.mod( Bx, 360 )
+    order   = np.lexsort( (B_alpha, B_zone) )
+    B_zone  = B_zone[ order ]
+    B_alpha = B_alpha[ order ]
+
+    ##  Find the half width in alpha of the window around each position a.
+
+    A_zone  = np.floor( (Ay + 90) / radius ).astype( "int64" )
+    A_alpha = np.mod( Ax, 360 )
+    cos_max = np.cos( np.radians( np.minimum(np.abs(Ay) + radius, 90) ) )
+    width   = radius / np.maximum( cos_max, 1e-12 )
+
+    ##  Split each window, wrapped at 0 and 360 degrees, into two disjoint
+    ##  pieces [ low, high ] of alpha, the second of which may be empty.  A
+    ##  high of 360 is the end of the zone.
+
+    low     = A_alpha - width
+    high    = A_alpha + width
+    full    = width >= 180
+    under   = ( low < 0 ) & ~full
+    over    = ( high >= 360 ) & ~full
+
+    pieces  = [
+        [ np.where( under | over | full, 0, low ),
+          np.where( under, high, np.where( over, high - 360, high ) ) ],
+        [ np.where( under, low + 360, low ), np.full( Ax.size, 360.0 ) ],
+    ]
+    pieces[0][1][ full ]    = 360
+    second  = under | over
+
+    ##  Sweep positions a in the same order, so that the searches of positions
+    ##  b move steadily through the sorted positions.
+
+    A_order = np.lexsort( (A_alpha, A_zone) )
+
+    for first in range( 0, Ax.size, block_size ):
+
+        block   = A_order[ first:first+block_size ]
+        pairs_a = [ np.zeros( 0, dtype="int64" ) ]
+        pairs_b = [ np.zeros( 0, dtype="int64" ) ]
+
+        ##  Search the pieces of the window in the zone of each position a
+        ##  and the zones above and below it.  A piece starts no earlier than
+        ##  the piece before it stops, so no pair is found twice.
+
+        for dz in [ -1, 0, 1 ]:
+
+            zone    = A_zone[ block ] + dz
+            begin   = np.searchsorted( B_zone, zone, side="left" )
+            end     = np.searchsorted( B_zone, zone, side="right" )
+            stop    = begin
+
+            for k, ( piece_low, piece_high ) in enumerate( pieces ):
+
+                start   = search_zone(
+                    B_alpha, begin, end, piece_low[block], side="left"
+                )
+                start   = np.maximum( start, stop )
+                stop    = search_zone(
+                    B_alpha, begin, end, piece_high[block], side="right"
+                )
+                count   = np.maximum( stop - start, 0 )
+
+                if k == 1:
+                    count[ ~second[block] ] = 0
+
+                if count.sum() == 0:
+                    continue
+
+                ##  Expand each window into its pairs.
+
+                offsets = np.cumsum( count ) - count
+                within  = np.arange( count.sum() ) - np.repeat(
+                    offsets, count
+                )
+
+                pairs_a.append( np.repeat( block, count ) )
+                pairs_b.append( order[ np.repeat( start, count ) + within ] )
+
+        pairs_a = np.concatenate( pairs_a )
+        pairs_b = np.concatenate( pairs_b )
+
+        ##  Keep the pairs within the radius of each position a.
+
+        sep     = separation(
+            Ax[pairs_a], Ay[pairs_a], Bx[pairs_b], By[pairs_b]
+        )
+        near    = sep <= Rc[ pairs_a ]
+
+        yield   pairs_a[ near ], pairs_b[ near ], sep[ near ]
+
+def search_zone( values, first, last, targets, side="left" ):
+    """
+    Returns the indices at which targets would be inserted into the sorted
+    slices values[ first:last ], one slice per target, as numpy.searchsorted()
+    does with side.  The slices are searched together by bisection.
+    """
+
+    low, high   = first.copy(), last.copy()
+    active      = low < high
+
+    while np.any( active ):
+
+        middle  = ( low + high ) // 2
+        value   = values[ np.minimum( middle, values.size - 1 ) ]
+
+        if side == "left":
+            right   = active & ( value < targets )
+        else:
+            right   = active & ( value <= targets )
+
+        low     = np.where( right, middle + 1, low )
+        high    = np.where( active & ~right, middle, high )
+        active  = low < high
+
+    return  low
+
+def separation( Ax, Ay, Bx, By ):
+    """
+    Returns the angular separations in degrees of positions ( alpha, delta ) a
+    and b in degrees, found with the haversine formula.
+    """
+
+    Ax, Ay  = np.radians( Ax ), np.radians( Ay )
+    Bx, By  = np.radians( Bx ), np.radians( By )
+
+    h   = np.sin( (By - Ay) / 2 )**2
+    h  += np.cos( Ay ) * np.cos( By ) * np.sin( (Bx - Ax) / 2 )**2
+
+    return  np.degrees( 2 * np.arcsin( np.sqrt( np.clip(h, 0, 1) ) ) )
+
+##  ============================================================================
+
+def brute_pairs( Ax, Ay, Bx, By, Rc ):
+    """
+    Finds every pair of positions a and b within the radius Rc of position a
+    by computing the separation of each position a from every position b.
+    """
+
+    pairs_a = [ np.zeros( 0, dtype="int64" ) ]
+    pairs_b = [ np.zeros( 0, dtype="int64" ) ]
+    sep     = [ np.zeros( 0, dtype="float64" ) ]
+
+    for i in io.progress_bar( Ax.size, alert="Correlating..." ):
+
+        Sj      = np.sqrt( (Bx - Ax[i])**2 + (By - Ay[i])**2 )
+        near    = np.where( Sj <= Rc[i] )[0]
+
+        pairs_a.append( np.full( near.size, i, dtype="int64" ) )
+        pairs_b.append( near )
+        sep.append( Sj[ near ] )
+
+    return  np.concatenate( pairs_a ), np.concatenate( pairs_b ), \
+            np.concatenate( sep )
+
+def tree_pairs( Ax, Ay, Bx, By, Rc, a_tree=None ):
+    """
+    Finds every pair of positions a and b within the radius Rc of position a
+    from the sparse distance matrix of k-d trees of positions a and b.  A tree
+    of positions a may be given as a_tree, so that it is built only once when
+    positions b are matched in chunks.
+    """
+
+    if Ax.size == 0 or Bx.size == 0:
+        return  np.zeros( 0, dtype="int64" ), np.zeros( 0, dtype="int64" ), \
+                np.zeros( 0, dtype="float64" )
+
+    if a_tree is None:
+        a_tree  = scipy.spatial.cKDTree( np.column_stack( (Ax, Ay) ) )
+
+    b_tree  = scipy.spatial.cKDTree( np.column_stack( (Bx, By) ) )
+
+    pairs   = a_tree.sparse_distance_matrix(
+        b_tree, np.max( Rc ), output_type="ndarray"
+    )
+    pairs   = pairs[ pairs["v"] <= Rc[ pairs["i"] ] ]
+
+    return  pairs["i"].astype( "int64" ), pairs["j"].astype( "int64" ), \
+            pairs["v"].astype( "float64" )
+
+def zone_pairs( Ax, Ay, Bx, By, Rc, block_size=2**20 ):
+    """
+    Finds every pair of positions a and b within the radius Rc of position a
+    by a sort and sweep over declination zones ( see zone_blocks() ).
+    """
+
+    blocks  = [( np.zeros( 0, dtype="int64" ), np.zeros( 0, dtype="int64" ),
+                 np.zeros( 0, dtype="float64" ) )]
+    blocks += list( zone_blocks( Ax, Ay, Bx, By, Rc, block_size=block_size ) )
+
+    return  tuple( np.concatenate( arrays ) for arrays in zip( *blocks ) )
+
+##  ============================================================================
+
+##  Engines which find the nearest position b of each position a, and engines
+##  which find every pair of positions a and b within the radius Rc.
+
+nearest_engines = {
+    "brute":    brute,
+    "tree":     tree,
+    "zone":     zone,
+}
+
+pair_engines    = {
+    "brute":    brute_pairs,
+    "tree":     tree_pairs,
+    "zone":     zone_pairs,
+}
@@ -290,7 +290,7 @@ class master:
         self.master["S"]       /= (self.master["matches"] - 1)
         self.fits_cube[1].data  = self.master
 
-    def correlate( self, cat_name, catalog, Rc, append=True ):
+    def correlate( self, cat_name, catalog, Rc, append=True, workers=None ):
         """
         Correlates all objects from the new catalog to the existing master
         catalog extension and then adds the created extension to the MCC using
@@ -301,38 +301,51 @@ class master:
             catalog     - catalog array to correlate to the master
             Rc          - correlation radius (R < Rc is a match)
             append=True - if True, adds non-matched objects to the MCC
+            workers     - if given, correlates in this many processes
         """
 
-        ##  Read in input catalog and add a master id column.
+        with io.profile.span( "master.correlate" ):
 
-        if "id" not in catalog.dtype.names:
-            catalog  = io.add_column( catalog, "id", "int64" )
+            ##  Read in input catalog and add a master id column.
 
-        ##  Perform correlation with the master catalog.
+            if "id" not in catalog.dtype.names:
+                catalog  = io.add_column( catalog, "id", "int64" )
 
-        M, S, Pa, Nb   = mcc.correlate(
-            self.master[ "alpha" ], self.master[ "delta" ],
-            catalog[ "alpha" ], catalog[ "delta" ],
-            self.master[ "Rc" ], Rc_min=Rc
-        )
+            ##  Perform correlation with the master catalog.
 
-        ##  Create the new catalog master.
-        ##  Append unmatched objects if Append==True.
-        new_cat         = np.zeros( self.master.size, dtype=catalog.dtype )
-        new_cat.fill(-99)
-        new_cat[Pa]     = catalog[ M[Pa] ]
+            with io.profile.span( "mcc.correlate" ):
 
-        if append is True:
-            new_cat = np.concatenate( (new_cat, catalog[Nb]), axis=0 )
+                if workers is None:
+                    M, S, Pa, Nb   = mcc.correlate(
+                        self.master[ "alpha" ], self.master[ "delta" ],
+                        catalog[ "alpha" ], catalog[ "delta" ],
+                        self.master[ "Rc" ], Rc_min=Rc
+                    )
 
-        new_cat["id"]   = np.arange( 1, new_cat.size + 1, dtype="int64" )
+                else:
+                    M, S, Pa, Nb   = mcc.correlate_parallel(
+                        self.master[ "alpha" ], self.master[ "delta" ],
+                        catalog[ "alpha" ], catalog[ "delta" ],
+                        self.master[ "Rc" ], Rc_min=Rc, workers=workers
+                    )
 
-        ##  Append the new catalog.
-        ##  Update the master catalog and save changes.
+            ##  Create the new catalog master.
+            ##  Append unmatched objects if Append==True.
+            new_cat         = np.zeros( self.master.size, dtype=catalog.dtype )
+            new_cat.fill(-99)
+            new_cat[Pa]     = catalog[ M[Pa] ]
 
-        self.append( cat_name, new_cat, Rc=Rc )
-        self.update()
-        #self.save( overwrite=True )
+            if append is True:
+                new_cat = np.concatenate( (new_cat, catalog[Nb]), axis=0 )
+
+            new_cat["id"]   = np.arange( 1, new_cat.size + 1, dtype="int64" )
+
+            ##  Append the new catalog.
+            ##  Update the master catalog and save changes.
+
+            self.append( cat_name, new_cat, Rc=Rc )
+            self.update()
+            #self.save( overwrite=True )
 
     def remove_cat( self, cat_name ):
 
@@ -386,12 +399,9 @@ class master:
 
         ##  For each frame, look for all objects closest to this frame.
 
-        for i, image in enumerate( cube ):
-
-            io.progress(
-                i, len(cube),
-                alert="Testing coverage in each frame in %s." % fits_file
-            )
+        for i, image in enumerate( io.progress_bar(
+            cube, alert="Testing coverage in each frame in %s." % fits_file
+        ) ):
 
             nots    = np.where(
                 (catalog["frame"] == image.frame) & (catalog["alpha"] < 0)
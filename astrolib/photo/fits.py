@@ -257,9 +257,7 @@ def find_frames( fits_file, alpha, delta ):
 
     frames = np.zeros( len(alpha), dtype="int32" )
 
-    for i in range( frames.size ):
-
-        io.progress( i, frames.size, alert="Finding best frames." )
+    for i in io.progress_bar( frames.size, alert="Finding best frames." ):
 
         frames[i]   = im_frames[
             int( np.where( distances[i] == np.min(distances[i]) )[0] )
@@ -66,38 +66,38 @@ class PIM:
 
         else:
             self.grid   = None
-            pickle.dump( self, gzip.open(self.file_name, "wb") )
+            io.save_obj( self, self.file_name, overwrite=True )
 
     def open( self, file_name, init=False ):
 
-        pim  = pickle.load( gzip.open(file_name, "rb") )
+        pim  = io.load_obj( file_name )
 
         self.file_name      = file_name
-        self.header         = pim.header
-
-        self.sci            = pim.sci
-        self.sky            = pim.sky
-        self.var            = pim.var
-        self.mask           = pim.mask
-        self.grid           = pim.grid
-
-        self.wcs            = pim.wcs
-        self.theta          = pim.theta
-        self.x0             = pim.x0
-        self.y0             = pim.y0
-        self.a0             = pim.a0
-        self.b0             = pim.b0
-
-        self.scale          = pim.scale
-        self.seeing         = pim.seeing
-        self.psf            = pim.psf
-
-        self.exposure       = pim.exposure
-        self.gain           = pim.gain
-        self.zero           = pim.zero
-        self.dzero          = pim.dzero
-        self.limit          = pim.limit
-        self.dlimit         = pim.dlimit
+        self.header         = pim["header"]
+
+        self.sci            = pim["sci"]
+        self.sky            = pim["sky"]
+        self.var            = pim["var"]
+        self.mask           = pim["mask"]
+        self.grid           = pim["grid"]
+
+        self.wcs            = pim["wcs"]
+        self.theta          = pim["theta"]
+        self.x0             = pim["x0"]
+        self.y0             = pim["y0"]
+        self.a0             = pim["a0"]
+        self.b0             = pim["b0"]
+
+        self.scale          = pim["scale"]
+        self.seeing         = pim["seeing"]
+        self.psf            = pim["psf"]
+
+        self.exposure       = pim["exposure"]
+        self.gain           = pim["gain"]
+        self.zero           = pim["zero"]
+        self.dzero          = pim["dzero"]
+        self.limit          = pim["limit"]
+        self.dlimit         = pim["dlimit"]
 
         del pim
 